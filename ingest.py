@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+智能文档问答助手 - 离线批量导入工具
+
+绕过FastAPI和multipart上传，直接调用 PDFLearningAssistant.load_document
+将目录树或清单文件中的文档批量导入指定用户的知识库命名空间。
+
+用法示例：
+    python ingest.py --user-id alice --dir ./docs
+    python ingest.py --user-id alice --manifest files.txt --processes 4 --threads 8
+"""
+
+import argparse
+import concurrent.futures
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+# 加载环境变量
+load_dotenv()
+
+# 支持导入的文件扩展名（与 load_document 保持一致）
+SUPPORTED_EXTENSIONS = {".pdf", ".jpg", ".jpeg", ".png", ".gif", ".webp"}
+
+# 子进程内的助手实例（每个进程一个）
+_worker_assistant = None
+
+
+def collect_from_directory(root: str) -> List[str]:
+    """递归遍历目录，收集所有支持的文件
+
+    Args:
+        root: 根目录
+
+    Returns:
+        List[str]: 按路径排序的文件列表
+    """
+    file_paths = []
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            if os.path.splitext(filename)[1].lower() in SUPPORTED_EXTENSIONS:
+                file_paths.append(os.path.join(dirpath, filename))
+    return sorted(file_paths)
+
+
+def collect_from_manifest(manifest_path: str) -> List[Tuple[str, Optional[str]]]:
+    """读取清单文件
+
+    每行一个文件，可用制表符附加原始文件名：``路径<TAB>原始文件名``。
+    空行和以 # 开头的行会被忽略，相对路径相对于清单文件所在目录解析。
+    未指定原始文件名时，以相对于清单文件所在目录的路径作为文档名（目录外的文件使用绝对路径），
+    避免不同目录下的同名文件冲突。
+
+    Args:
+        manifest_path: 清单文件路径
+
+    Returns:
+        List[Tuple[str, Optional[str]]]: (文件路径, 文档名) 列表
+    """
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    entries = []
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            path, _, original_filename = line.partition("\t")
+            path = path.strip()
+            if not os.path.isabs(path):
+                path = os.path.join(base_dir, path)
+            original_filename = original_filename.strip()
+            if not original_filename:
+                relative = os.path.relpath(path, base_dir)
+                outside = relative == os.pardir or relative.startswith(os.pardir + os.sep)
+                original_filename = path if outside else relative
+                original_filename = original_filename.replace(os.sep, "/")
+            entries.append((path, original_filename))
+    return entries
+
+
+def _init_worker(user_id: str):
+    """子进程初始化：为当前进程创建独立的助手实例"""
+    global _worker_assistant
+    from src.assistant.learning_assistant import PDFLearningAssistant
+    _worker_assistant = PDFLearningAssistant(user_id=user_id)
+
+
+def _load_one(assistant, entry: Tuple[str, Optional[str]]) -> Dict[str, Any]:
+    """导入单个文件，异常统一转换为失败结果"""
+    file_path, original_filename = entry
+    try:
+        result = assistant.load_document(file_path, original_filename=original_filename)
+    except Exception as e:
+        result = {"success": False, "message": f"处理文件 {file_path} 时出错: {str(e)}"}
+    result["file_path"] = file_path
+    return result
+
+
+def _load_chunk_in_worker(entries: List[Tuple[str, Optional[str]]], threads: int) -> List[Dict[str, Any]]:
+    """在子进程内用线程池导入一批文件"""
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+        return list(executor.map(lambda entry: _load_one(_worker_assistant, entry), entries))
+
+
+def run_ingest(
+    entries: List[Tuple[str, Optional[str]]],
+    user_id: str,
+    processes: int = 1,
+    threads: int = 4,
+    batch_size: int = 64
+) -> List[Dict[str, Any]]:
+    """批量导入文件
+
+    Args:
+        entries: (文件路径, 原始文件名) 列表
+        user_id: 目标用户ID，对应 pdf_{user_id} 命名空间
+        processes: 进程数，1 表示仅在当前进程内使用线程池
+        threads: 每个进程的线程数
+        batch_size: 多进程模式下每次派发给子进程的文件数
+
+    Returns:
+        List[Dict[str, Any]]: 每个文件的处理结果
+    """
+    results = []
+    total = len(entries)
+    start_time = time.time()
+
+    def report_progress():
+        done = len(results)
+        elapsed = time.time() - start_time
+        rate = done / elapsed if elapsed > 0 else 0.0
+        print(f"\r进度: {done}/{total} ({rate:.2f} 文件/秒)", end="", flush=True)
+
+    if processes <= 1:
+        from src.assistant.learning_assistant import PDFLearningAssistant
+        assistant = PDFLearningAssistant(user_id=user_id)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+            futures = [executor.submit(_load_one, assistant, entry) for entry in entries]
+            for future in concurrent.futures.as_completed(futures):
+                results.append(future.result())
+                report_progress()
+    else:
+        batches = [entries[i:i + batch_size] for i in range(0, total, batch_size)]
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=processes,
+            initializer=_init_worker,
+            initargs=(user_id,)
+        ) as executor:
+            future_to_batch = {
+                executor.submit(_load_chunk_in_worker, batch, threads): batch
+                for batch in batches
+            }
+            for future in concurrent.futures.as_completed(future_to_batch):
+                try:
+                    results.extend(future.result())
+                except Exception as e:
+                    # 子进程崩溃时整批记为失败
+                    for file_path, _ in future_to_batch[future]:
+                        results.append({
+                            "success": False,
+                            "message": f"工作进程异常: {str(e)}",
+                            "file_path": file_path
+                        })
+                report_progress()
+
+    if total:
+        print()
+    return results
+
+
+def print_report(results: List[Dict[str, Any]], elapsed: float) -> int:
+    """打印吞吐量和失败报告
+
+    Args:
+        results: 处理结果列表
+        elapsed: 总耗时（秒）
+
+    Returns:
+        int: 失败数量
+    """
+    succeeded = [r for r in results if r.get("success")]
+    failed = [r for r in results if not r.get("success")]
+    rate = len(results) / elapsed if elapsed > 0 else 0.0
+
+    print("\n" + "=" * 60)
+    print("批量导入完成")
+    print("=" * 60)
+    print(f"总计: {len(results)}  成功: {len(succeeded)}  失败: {len(failed)}")
+    print(f"耗时: {elapsed:.2f}秒  吞吐量: {rate:.2f} 文件/秒")
+
+    if failed:
+        print("\n失败列表:")
+        for r in failed:
+            print(f"  ❌ {r.get('file_path', '?')}: {r.get('message', '')}")
+
+    return len(failed)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """构建命令行参数解析器"""
+    parser = argparse.ArgumentParser(description="离线批量导入文档到知识库")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--dir", help="递归导入该目录下所有支持的文件")
+    source.add_argument("--manifest", help="清单文件，每行一个路径（可用TAB附加原始文件名）")
+    parser.add_argument("--user-id", default="default_user", help="目标用户ID（命名空间 pdf_{user_id}）")
+    parser.add_argument("--processes", type=int, default=1, help="进程数（默认: 1）")
+    parser.add_argument("--threads", type=int, default=4, help="每个进程的线程数（默认: 4）")
+    parser.add_argument("--batch-size", type=int, default=64, help="多进程模式下每批文件数（默认: 64）")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """主函数 - 解析参数并执行批量导入"""
+    args = build_parser().parse_args(argv)
+
+    if args.dir:
+        if not os.path.isdir(args.dir):
+            print(f"❌ 目录不存在: {args.dir}")
+            return 2
+        # 以相对于 --dir 的路径作为文档名，避免不同子目录下的同名文件冲突
+        entries = [
+            (path, os.path.relpath(path, args.dir).replace(os.sep, "/"))
+            for path in collect_from_directory(args.dir)
+        ]
+    else:
+        if not os.path.isfile(args.manifest):
+            print(f"❌ 清单文件不存在: {args.manifest}")
+            return 2
+        entries = collect_from_manifest(args.manifest)
+
+    if not entries:
+        print("ℹ️ 没有找到需要导入的文件")
+        return 0
+
+    print(f"开始导入 {len(entries)} 个文件 (用户: {args.user_id}, "
+          f"进程: {args.processes}, 线程/进程: {args.threads})")
+
+    start_time = time.time()
+    results = run_ingest(
+        entries,
+        user_id=args.user_id,
+        processes=max(1, args.processes),
+        threads=max(1, args.threads),
+        batch_size=max(1, args.batch_size)
+    )
+    failures = print_report(results, time.time() - start_time)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -15,9 +15,10 @@
 - src/utils/parallel_processor.py: 并行处理工具
 """
 
+import argparse
+import os
 import uvicorn
 from dotenv import load_dotenv
-from src.api.app import app
 
 # 加载环境变量
 load_dotenv()
@@ -25,17 +26,34 @@ load_dotenv()
 
 def main():
     """主函数 - 启动FastAPI Web服务"""
+    parser = argparse.ArgumentParser(description="智能文档问答助手")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.getenv("WEB_WORKERS", 1)),
+        help="工作进程数（默认读取 WEB_WORKERS，未设置时为1）"
+    )
+    args = parser.parse_args()
+    workers = max(1, args.workers)
+
+    # 多进程模式下会话状态、文档清单和缓存版本号存放在共享的SQLite存储中
+    if workers > 1:
+        os.environ.setdefault("SHARED_STATE_PATH", os.path.join("shared_state", "state.db"))
+
     print("\n" + "="*60)
     print("智能文档问答助手")
     print("="*60)
+    if workers > 1:
+        print(f"工作进程: {workers}  共享状态: {os.environ['SHARED_STATE_PATH']}")
     print("\n")
 
-    # 启动FastAPI应用
+    # 启动FastAPI应用（以导入字符串方式传入，便于uvicorn启动多个工作进程）
     uvicorn.run(
-        app,
+        "src.api.app:app",
         host="0.0.0.0",
         port=7866,
         reload=False,
+        workers=workers,
         log_level="info"
     )
 
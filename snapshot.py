@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+智能文档问答助手 - 命名空间快照工具
+
+导出或导入 pdf_{user_id} 知识库命名空间，用于快速部署新环境和从存储丢失中恢复。
+知识库向量直接写入，不调用LLM和嵌入模型；记忆默认不恢复，
+可用 --replay-memory 重放写入日志恢复（会逐条重新嵌入）。
+
+用法示例：
+    python snapshot.py export --user-id alice --output alice.snapshot.zip
+    python snapshot.py import --input alice.snapshot.zip [--user-id bob] [--replay-memory]
+"""
+
+import argparse
+import sys
+import time
+from typing import List, Optional
+
+from dotenv import load_dotenv
+
+# 加载环境变量
+load_dotenv()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """构建命令行参数解析器"""
+    parser = argparse.ArgumentParser(description="知识库命名空间快照导出/导入")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="导出命名空间到归档文件")
+    export_parser.add_argument("--user-id", required=True, help="用户ID（命名空间 pdf_{user_id}）")
+    export_parser.add_argument("--output", required=True, help="归档文件路径")
+    export_parser.add_argument("--collection", help="Qdrant集合名（默认 rag_knowledge_base，与RAG工具一致）")
+
+    import_parser = subparsers.add_parser("import", help="从归档文件导入到空的命名空间")
+    import_parser.add_argument("--input", required=True, help="归档文件路径")
+    import_parser.add_argument("--user-id", help="目标用户ID（默认使用归档中的用户）")
+    import_parser.add_argument("--collection", help="Qdrant集合名（默认 rag_knowledge_base，与RAG工具一致）")
+    import_parser.add_argument("--replay-memory", action="store_true",
+                               help="重放记忆写入日志恢复情景和语义记忆（会逐条调用嵌入模型）")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """主函数 - 执行导出或导入"""
+    args = build_parser().parse_args(argv)
+    from src.assistant.namespace_snapshot import export_namespace, import_namespace
+
+    start_time = time.time()
+    try:
+        if args.command == "export":
+            manifest = export_namespace(args.user_id, args.output, collection=args.collection)
+            print(f"✅ 已导出命名空间 {manifest['namespace']}: {manifest['count']} 个块, "
+                  f"维度 {manifest['vector_size']} -> {args.output}")
+        else:
+            result = import_namespace(
+                args.input,
+                user_id=args.user_id,
+                collection=args.collection,
+                restore_memory=args.replay_memory
+            )
+            if not result["success"]:
+                print(f"❌ {result['message']}")
+                return 1
+            print(f"✅ {result['message']}")
+    except Exception as e:
+        print(f"❌ 快照{'导出' if args.command == 'export' else '导入'}失败: {str(e)}")
+        return 1
+
+    print(f"耗时: {time.time() - start_time:.2f}秒")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,14 +6,24 @@
 负责提供API端点和静态文件服务
 """
 
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from fastapi import FastAPI, Request, UploadFile, File, Form, HTTPException
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse
 from typing import List, Dict, Any
+import hmac
 import os
 import tempfile
 from src.assistant.learning_assistant import PDFLearningAssistant
 from src.utils.parallel_processor import process_files_in_parallel
+from src.utils.shared_store import SharedStore
+from src.utils.cache import memory_search_cache
+from src.utils import profiler
+from src.utils.executor_pool import (
+    QueueFullError,
+    ingest_executor,
+    chat_executor,
+    light_executor
+)
 
 # 创建FastAPI应用
 app = FastAPI(
@@ -25,22 +35,156 @@ app = FastAPI(
 # 全局助手实例
 assistant_state = {"assistant": None}
 
+# 多进程部署时的共享状态存储（未配置 SHARED_STATE_PATH 时为None，即单进程模式）
+shared_store = SharedStore.from_env()
+if shared_store is not None:
+    memory_search_cache.attach_store(shared_store)
+
+# 开启剖析时为助手方法和上游调用安装计时补丁
+if profiler.PROFILING_ENABLED:
+    profiler.install_profiling()
+
 # 挂载静态文件目录
 app.mount("/static", StaticFiles(directory="src/ui/static"), name="static")
 
+
+@app.exception_handler(QueueFullError)
+async def queue_full_handler(request: Request, exc: QueueFullError) -> JSONResponse:
+    """执行器排队已满时返回503，并提示客户端稍后重试"""
+    return JSONResponse(
+        status_code=503,
+        content={"success": False, "message": f"❌ {exc}"},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+
+@app.on_event("shutdown")
+def shutdown_executors():
+    """关闭执行器"""
+    for executor in (ingest_executor, chat_executor, light_executor):
+        executor.shutdown(wait=False)
+
+
+async def _sync_assistant():
+    """共享模式下使本进程的助手与当前活动会话保持一致
+
+    会话可能由其他工作进程初始化，此时在本进程内接续该会话。
+    """
+    if shared_store is None:
+        return
+    # SQLite读写是阻塞调用，放到轻量线程池中执行，不占用事件循环
+    active = await light_executor.run(shared_store.get, "app", "active_session")
+    if active is None:
+        return
+    assistant = assistant_state["assistant"]
+    if assistant is None or assistant.session_id != active["session_id"]:
+        assistant_state["assistant"] = await chat_executor.run(
+            PDFLearningAssistant,
+            user_id=active["user_id"],
+            store=shared_store,
+            session_id=active["session_id"]
+        )
+
+
+async def profiling_middleware(request: Request, call_next):
+    """为API请求建立耗时追踪，结束后交给飞行记录器
+
+    请求头 X-Profile: 1 或查询参数 profile=1 时额外开启采样剖析。
+    """
+    if not request.url.path.startswith("/api/") or request.url.path.startswith("/api/admin/"):
+        return await call_next(request)
+
+    sample = request.headers.get("X-Profile") == "1" or request.query_params.get("profile") == "1"
+    trace = profiler.Trace(f"{request.method} {request.url.path}", sample=sample)
+    token = profiler.current_trace.set(trace)
+    try:
+        response = await call_next(request)
+    finally:
+        profiler.current_trace.reset(token)
+        trace.finish()
+        profiler.flight_recorder.record(trace)
+    response.headers["X-Trace-Id"] = str(trace.trace_id)
+    return response
+
+
+# 未开启剖析时不注册中间件，普通请求不经过额外的调度
+if profiler.PROFILING_ENABLED:
+    app.middleware("http")(profiling_middleware)
+
+# 未配置 ADMIN_TOKEN 时，管理接口只接受来自本机的请求
+_LOOPBACK_HOSTS = {"127.0.0.1", "::1", "localhost"}
+
+
+def _check_admin(request: Request):
+    """校验管理接口访问权限
+
+    配置了 ADMIN_TOKEN 时必须携带匹配的 X-Admin-Token 请求头，否则只允许本机访问。
+    """
+    if not profiler.PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="剖析未开启")
+    admin_token = os.getenv("ADMIN_TOKEN")
+    if admin_token:
+        if not hmac.compare_digest(request.headers.get("X-Admin-Token", ""), admin_token):
+            raise HTTPException(status_code=403, detail="无权访问")
+    elif request.client is None or request.client.host not in _LOOPBACK_HOSTS:
+        raise HTTPException(status_code=403, detail="未配置 ADMIN_TOKEN，管理接口仅允许本机访问")
+
+
+@app.get("/api/admin/profiles")
+async def get_profiles(request: Request) -> Dict[str, Any]:
+    """导出飞行记录器中最慢的请求及其阶段明细"""
+    _check_admin(request)
+    return {"success": True, **profiler.flight_recorder.dump()}
+
+
+@app.delete("/api/admin/profiles")
+async def clear_profiles(request: Request) -> Dict[str, Any]:
+    """清空飞行记录器"""
+    _check_admin(request)
+    profiler.flight_recorder.clear()
+    return {"success": True, "message": "✅ 飞行记录已清空"}
+
+
+@app.get("/api/admin/memory")
+async def get_memory_footprint(request: Request) -> Dict[str, Any]:
+    """按需估算当前会话的内存占用（字节）"""
+    _check_admin(request)
+    await _sync_assistant()
+    if assistant_state["assistant"] is None:
+        return {"success": False, "message": "❌ 请先初始化助手"}
+    try:
+        footprint = await light_executor.run(assistant_state["assistant"].memory_footprint)
+    except Exception as e:
+        return {"success": False, "message": f"❌ 内存估算失败: {str(e)}"}
+    return {"success": True, "session_id": assistant_state["assistant"].session_id, "footprint": footprint}
+
+
+def _save_temp_file(content: bytes, suffix: str) -> str:
+    """将上传内容写入临时文件并返回路径"""
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
+        temp_file.write(content)
+        return temp_file.name
+
+
 @app.post("/api/init_assistant")
-def init_assistant(user_id: str = Form("web_user")) -> Dict[str, Any]:
+async def init_assistant(user_id: str = Form("web_user")) -> Dict[str, Any]:
     """初始化助手"""
     global assistant_state
-    assistant_state["assistant"] = PDFLearningAssistant(user_id=user_id)
+    assistant = await chat_executor.run(PDFLearningAssistant, user_id=user_id, store=shared_store)
+    assistant_state["assistant"] = assistant
+    if shared_store is not None:
+        await light_executor.run(
+            shared_store.set, "app", "active_session", {"user_id": user_id, "session_id": assistant.session_id}
+        )
     return {"success": True, "message": f"✅ 助手已初始化 (用户: {user_id})"}
 
 
 
 @app.post("/api/load_multimodal")
-def load_multimodal(file: UploadFile = File(...)) -> Dict[str, Any]:
+async def load_multimodal(file: UploadFile = File(...)) -> Dict[str, Any]:
     """加载单个多模态文件（图片、音频等）"""
     global assistant_state
+    await _sync_assistant()
     if assistant_state["assistant"] is None:
         return {"success": False, "message": "❌ 请先初始化助手"}
 
@@ -63,23 +207,26 @@ def load_multimodal(file: UploadFile = File(...)) -> Dict[str, Any]:
     # 根据扩展名确定文件类型
     content_type = supported_extensions[file_ext]
 
-    # 保存临时文件
-    with tempfile.NamedTemporaryFile(delete=False, suffix=file_ext) as temp_file:
-        temp_file.write(file.file.read())
-        temp_path = temp_file.name
+    assistant = assistant_state["assistant"]
+    content = await file.read()
 
-    try:
-        # 直接使用现有的load_document方法
-        result = assistant_state["assistant"].load_document(temp_path, original_filename=file.filename)
-        return result
-    finally:
-        # 删除临时文件
-        os.unlink(temp_path)
+    def load():
+        # 保存临时文件
+        temp_path = _save_temp_file(content, file_ext)
+        try:
+            # 直接使用现有的load_document方法
+            return assistant.load_document(temp_path, original_filename=file.filename)
+        finally:
+            # 删除临时文件
+            os.unlink(temp_path)
+
+    return await ingest_executor.run(load)
 
 @app.post("/api/load_multimodal_parallel")
-def load_multimodal_parallel(files: List[UploadFile] = File(...)) -> Dict[str, Any]:
+async def load_multimodal_parallel(files: List[UploadFile] = File(...)) -> Dict[str, Any]:
     """并行加载多个多模态文件（图片、音频等）"""
     global assistant_state
+    await _sync_assistant()
     if assistant_state["assistant"] is None:
         return {"success": False, "message": "❌ 请先初始化助手"}
 
@@ -96,54 +243,60 @@ def load_multimodal_parallel(files: List[UploadFile] = File(...)) -> Dict[str, A
         "pdf": "application/pdf"
     }
 
-    temp_paths = []
-    temp_to_original = {}
-    try:
-        # 保存所有临时文件并记录原始文件名
-        for file in files:
-            # 从文件名获取扩展名
-            file_ext = file.filename.split(".")[-1].lower() if file.filename else ""
-            
-            if file_ext not in supported_extensions:
-                return {"success": False, "message": f"❌ 不支持的文件类型: {file_ext}"}
-
-            # 根据扩展名确定文件类型
-            content_type = supported_extensions[file_ext]
-
-            with tempfile.NamedTemporaryFile(delete=False, suffix=file_ext) as temp_file:
-                temp_file.write(file.file.read())
-                temp_path = temp_file.name
+    # 先校验所有文件类型并读取内容
+    uploads = []
+    for file in files:
+        # 从文件名获取扩展名
+        file_ext = file.filename.split(".")[-1].lower() if file.filename else ""
+
+        if file_ext not in supported_extensions:
+            return {"success": False, "message": f"❌ 不支持的文件类型: {file_ext}"}
+
+        uploads.append((file.filename, file_ext, await file.read()))
+
+    assistant = assistant_state["assistant"]
+
+    def load_all():
+        temp_paths = []
+        temp_to_original = {}
+        try:
+            # 保存所有临时文件并记录原始文件名
+            for filename, file_ext, content in uploads:
+                temp_path = _save_temp_file(content, file_ext)
                 temp_paths.append(temp_path)
-                temp_to_original[temp_path] = file.filename
-
-        # 创建闭包函数来传递原始文件名
-        def process_file_with_original(temp_path):
-            original_filename = temp_to_original[temp_path]
-            return assistant_state["assistant"].load_document(
-                temp_path, 
-                original_filename=original_filename
+                temp_to_original[temp_path] = filename
+
+            # 创建闭包函数来传递原始文件名
+            def process_file_with_original(temp_path):
+                original_filename = temp_to_original[temp_path]
+                return assistant.load_document(
+                    temp_path,
+                    original_filename=original_filename
+                )
+
+            # 并行处理文件
+            results = process_files_in_parallel(
+                file_paths=temp_paths,
+                process_func=process_file_with_original
             )
 
-        # 并行处理文件
-        results = process_files_in_parallel(
-            file_paths=temp_paths,
-            process_func=process_file_with_original
-        )
+            return {"success": True, "results": results}
+        finally:
+            # 删除所有临时文件
+            for temp_path in temp_paths:
+                try:
+                    os.unlink(temp_path)
+                except Exception as e:
+                    print(f"删除临时文件 {temp_path} 失败: {e}")
 
-        return {"success": True, "results": results}
-    finally:
-        # 删除所有临时文件
-        for temp_path in temp_paths:
-            try:
-                os.unlink(temp_path)
-            except Exception as e:
-                print(f"删除临时文件 {temp_path} 失败: {e}")
+    return await ingest_executor.run(load_all)
 
 @app.post("/api/chat")
-def chat(message: str = Form(...), history: str = Form("[]")) -> Dict[str, Any]:
+async def chat(message: str = Form(...), history: str = Form("[]")) -> Dict[str, Any]:
     """聊天功能"""
     import json
     global assistant_state
+    await _sync_assistant()
     if assistant_state["assistant"] is None:
         return {"success": False, "message": "❌ 请先初始化助手"}
 
@@ -159,11 +312,11 @@ def chat(message: str = Form(...), history: str = Form("[]")) -> Dict[str, Any]:
     # 判断是技术问题还是回顾问题
     if any(keyword in message for keyword in ["之前", "学过", "回顾", "历史", "记得"]):
         # 回顾学习历程
-        response = assistant_state["assistant"].recall(message)
+        response = await chat_executor.run(assistant_state["assistant"].recall, message)
         response = f"🧠 **学习回顾**\n\n{response}"
     else:
         # 技术问答
-        response = assistant_state["assistant"].ask(message)
+        response = await chat_executor.run(assistant_state["assistant"].ask, message)
         response = f"💡 **回答**\n\n{response}"
 
     # 更新历史记录
@@ -172,36 +325,41 @@ def chat(message: str = Form(...), history: str = Form("[]")) -> Dict[str, Any]:
     return {"success": True, "response": response, "history": chat_history}
 
 @app.post("/api/add_note")
-def add_note(note_content: str = Form(...), concept: str = Form(None)) -> Dict[str, Any]:
+async def add_note(note_content: str = Form(...), concept: str = Form(None)) -> Dict[str, Any]:
     """添加笔记"""
     global assistant_state
+    await _sync_assistant()
     if assistant_state["assistant"] is None:
         return {"success": False, "message": "❌ 请先初始化助手"}
 
     if not note_content.strip():
         return {"success": False, "message": "❌ 笔记内容不能为空"}
 
-    assistant_state["assistant"].add_note(note_content, concept)
+    # 语义记忆写入会调用嵌入模型并写入向量库和图数据库，不放在轻量线程池
+    await chat_executor.run(assistant_state["assistant"].add_note, note_content, concept)
     return {"success": True, "message": f"✅ 笔记已保存: {note_content[:50]}..."}
 
 @app.get("/api/get_stats")
-def get_stats() -> Dict[str, Any]:
+async def get_stats() -> Dict[str, Any]:
     """获取统计信息"""
     global assistant_state
+    await _sync_assistant()
     if assistant_state["assistant"] is None:
         return {"success": False, "message": "❌ 请先初始化助手"}
 
-    stats = assistant_state["assistant"].get_stats()
+    stats = await light_executor.run(assistant_state["assistant"].get_stats)
     return {"success": True, "stats": stats}
 
 @app.post("/api/generate_report")
-def generate_report() -> Dict[str, Any]:
+async def generate_report() -> Dict[str, Any]:
     """生成报告"""
     global assistant_state
+    await _sync_assistant()
     if assistant_state["assistant"] is None:
         return {"success": False, "message": "❌ 请先初始化助手"}
 
-    report = assistant_state["assistant"].generate_report(save_to_file=True)
+    # RAG统计缓存失效时需要查询向量库
+    report = await chat_executor.run(assistant_state["assistant"].generate_report, save_to_file=True)
 
     result = {
         "success": True,
@@ -218,7 +376,7 @@ def generate_report() -> Dict[str, Any]:
     return result
 
 @app.get("/")
-def read_root():
+async def read_root():
     """根路径返回静态HTML文件"""
     return FileResponse("src/ui/static/index.html")
 
@@ -76,6 +76,29 @@ class OpenAIVisionClient:
     def chat(self):
         return self.Chat(self)
 
+class OpenAIChatClient:
+    """答案合成使用的OpenAI兼容文本模型客户端"""
+
+    def __init__(self, api_key=None, model=None):
+        self.client = OpenAI(api_key=api_key or os.getenv("OPENAI_API_KEY"),
+                             base_url=os.getenv("LLM_BASE_URL"),
+                             timeout=float(os.getenv("LLM_TIMEOUT", 60)))
+        self.model = model or os.getenv("LLM_MODEL_ID")
+
+    def complete(self, messages, max_tokens=1000):
+        """调用模型并返回 (回答文本, 提示词token数)
+
+        提示词token数优先取接口返回的usage，接口未返回时为None
+        """
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            max_tokens=max_tokens
+        )
+        usage = getattr(response, "usage", None)
+        prompt_tokens = getattr(usage, "prompt_tokens", None) if usage else None
+        return response.choices[0].message.content, prompt_tokens
+
 if __name__ == "__main__":
     
     # 创建客户端
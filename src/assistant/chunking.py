@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+结构化分块 - 核心模块
+
+按MarkItDown输出的Markdown版面结构（标题、段落、表格、代码块）切分文档，
+以token数控制块大小，并为每个块记录页码和章节信息
+"""
+
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+from src.utils.tokens import estimate_tokens
+
+# 各文档类型的分块配置
+# max_tokens: 单块最大token数；min_tokens: 块低于该大小时继续合并后续内容；
+# overlap_tokens: 仅在超长段落按句切分时使用的重叠量
+CHUNK_PROFILES: Dict[str, Dict[str, int]] = {
+    "pdf": {"max_tokens": 400, "min_tokens": 80, "overlap_tokens": 0},
+    "image": {"max_tokens": 300, "min_tokens": 50, "overlap_tokens": 0},
+    "default": {"max_tokens": 400, "min_tokens": 80, "overlap_tokens": 0},
+}
+
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.*\S)\s*$")
+_FENCE_RE = re.compile(r"^\s*(```|~~~)")
+_TABLE_RE = re.compile(r"^\s*\|")
+_SENTENCE_RE = re.compile(r".+?(?:[。！？!?；;]+|\.(?=\s)|\n|$)", re.S)
+# 按窗口切分时的最小单元：单个中日韩字符，或一个单词连同其后的空白
+_WINDOW_UNIT_RE = re.compile(r"[぀-ヿ㐀-䶿一-鿿가-힯豈-﫿]|[^\s぀-ヿ㐀-䶿一-鿿가-힯豈-﫿]+\s*|\s+")
+
+
+def get_profile(doc_type: str) -> Dict[str, int]:
+    """获取文档类型的分块配置，可通过环境变量覆盖
+
+    例如 CHUNK_MAX_TOKENS_PDF=300、CHUNK_MIN_TOKENS_IMAGE=40。
+
+    Args:
+        doc_type: 文档类型（pdf、image等）
+
+    Returns:
+        Dict[str, int]: 分块配置
+    """
+    profile = dict(CHUNK_PROFILES.get(doc_type, CHUNK_PROFILES["default"]))
+    for key in profile:
+        env_value = os.getenv(f"CHUNK_{key.upper()}_{doc_type.upper()}")
+        if env_value and env_value.isdigit():
+            profile[key] = int(env_value)
+    return profile
+
+
+def _section(headings: List[str]) -> str:
+    """将标题栈格式化为章节路径"""
+    return " > ".join(h for h in headings if h)
+
+
+def _parse_blocks(text: str) -> List[Dict[str, Any]]:
+    """将Markdown文本解析为版面块
+
+    页与页之间以换页符(\\f)分隔。每个块包含 type、text、page 和 section。
+    """
+    blocks = []
+    headings: List[str] = []
+
+    for page_index, page_text in enumerate(text.split("\f"), start=1):
+        lines = page_text.splitlines()
+        i = 0
+        paragraph: List[str] = []
+
+        def flush_paragraph():
+            if paragraph:
+                content = "\n".join(paragraph).strip()
+                if content:
+                    blocks.append({
+                        "type": "paragraph",
+                        "text": content,
+                        "page": page_index,
+                        "section": _section(headings)
+                    })
+                paragraph.clear()
+
+        while i < len(lines):
+            line = lines[i]
+            heading = _HEADING_RE.match(line)
+            if heading:
+                flush_paragraph()
+                level = len(heading.group(1))
+                del headings[level - 1:]
+                headings.extend([""] * (level - 1 - len(headings)))
+                headings.append(heading.group(2))
+                blocks.append({
+                    "type": "heading",
+                    "text": line.strip(),
+                    "page": page_index,
+                    "section": _section(headings)
+                })
+                i += 1
+            elif _FENCE_RE.match(line):
+                flush_paragraph()
+                fence = _FENCE_RE.match(line).group(1)
+                code_lines = [line]
+                i += 1
+                while i < len(lines):
+                    code_lines.append(lines[i])
+                    i += 1
+                    if lines[i - 1].strip().startswith(fence):
+                        break
+                blocks.append({
+                    "type": "code",
+                    "text": "\n".join(code_lines),
+                    "page": page_index,
+                    "section": _section(headings)
+                })
+            elif _TABLE_RE.match(line):
+                flush_paragraph()
+                table_lines = []
+                while i < len(lines) and _TABLE_RE.match(lines[i]):
+                    table_lines.append(lines[i])
+                    i += 1
+                blocks.append({
+                    "type": "table",
+                    "text": "\n".join(table_lines),
+                    "page": page_index,
+                    "section": _section(headings)
+                })
+            elif not line.strip():
+                flush_paragraph()
+                i += 1
+            else:
+                paragraph.append(line)
+                i += 1
+        flush_paragraph()
+
+    return blocks
+
+
+def _chunk_section(blocks: List[Dict[str, Any]]) -> str:
+    """块的章节标注
+
+    取正文块（非标题）所属的章节，块跨越多个章节时依次列出；只有标题时使用标题的章节。
+    """
+    content = [b for b in blocks if b["type"] != "heading"] or blocks
+    sections: List[str] = []
+    for b in content:
+        if b["section"] and b["section"] not in sections:
+            sections.append(b["section"])
+    return "；".join(sections)
+
+
+def _split_by_window(text: str, max_tokens: int) -> List[str]:
+    """将没有句子或行边界可用的超长文本按单词/字符窗口切分"""
+    pieces: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+    for unit in _WINDOW_UNIT_RE.findall(text):
+        unit_tokens = estimate_tokens(unit)
+        if current and current_tokens + unit_tokens > max_tokens:
+            # 逐单元估算会因取整偏大，接近上限时按整段重新估算
+            exact_tokens = estimate_tokens("".join(current) + unit)
+            if exact_tokens <= max_tokens:
+                current.append(unit)
+                current_tokens = exact_tokens
+                continue
+            pieces.append("".join(current))
+            current, current_tokens = [], 0
+        current.append(unit)
+        current_tokens += unit_tokens
+    if current:
+        pieces.append("".join(current))
+    return pieces
+
+
+def _split_oversized(block: Dict[str, Any], max_tokens: int, overlap_tokens: int) -> List[Dict[str, Any]]:
+    """将超过大小上限的块切分为多个子块
+
+    表格和代码块按行切分（表格保留表头），段落按句切分；
+    单行或单句仍超过上限时，再按单词/字符窗口切分。
+    """
+    if block["type"] in ("table", "code"):
+        units = block["text"].split("\n")
+        header = units[:2] if block["type"] == "table" and len(units) > 2 else []
+        units = units[len(header):]
+        joiner = "\n"
+    else:
+        units = [s for s in _SENTENCE_RE.findall(block["text"]) if s.strip()]
+        header = []
+        joiner = ""
+
+    pieces = []
+    current: List[str] = []
+    current_tokens = estimate_tokens("\n".join(header))
+    base_tokens = current_tokens
+
+    window_tokens = max(1, max_tokens - base_tokens)
+    expanded: List[str] = []
+    for unit in units:
+        if estimate_tokens(unit) > window_tokens:
+            expanded.extend(_split_by_window(unit, window_tokens))
+        else:
+            expanded.append(unit)
+
+    for unit in expanded:
+        unit_tokens = estimate_tokens(unit)
+        if current and current_tokens + unit_tokens > max_tokens:
+            pieces.append(current)
+            # 句级重叠：保留上一子块末尾若干句
+            overlap: List[str] = []
+            overlap_size = 0
+            for previous in reversed(current):
+                size = estimate_tokens(previous)
+                if overlap_size + size > overlap_tokens:
+                    break
+                overlap.insert(0, previous)
+                overlap_size += size
+            current = overlap
+            current_tokens = base_tokens + overlap_size
+        current.append(unit)
+        current_tokens += unit_tokens
+    if current:
+        pieces.append(current)
+
+    return [
+        {**block, "text": joiner.join(header + piece) if joiner else "".join(piece).strip()}
+        for piece in pieces
+    ]
+
+
+def chunk_document(text: str, doc_type: str = "default", profile: Optional[Dict[str, int]] = None) -> List[Dict[str, Any]]:
+    """按版面结构将文档切分为块
+
+    Args:
+        text: MarkItDown输出的Markdown文本（页间以\\f分隔）
+        doc_type: 文档类型，用于选择分块配置
+        profile: 自定义分块配置（可选，覆盖doc_type对应的配置）
+
+    Returns:
+        List[Dict[str, Any]]: 块列表，每个块包含 text、tokens、page、page_end、section、index
+    """
+    profile = profile or get_profile(doc_type)
+    max_tokens = profile["max_tokens"]
+    min_tokens = profile["min_tokens"]
+    overlap_tokens = profile.get("overlap_tokens", 0)
+
+    chunks: List[Dict[str, Any]] = []
+    current: List[Dict[str, Any]] = []
+    current_tokens = 0
+
+    def flush(final: bool = False):
+        nonlocal current, current_tokens
+        # 块末尾的标题移到下一个块，避免标题与正文分离；只剩标题时整体保留到下一个块
+        carry: List[Dict[str, Any]] = []
+        if not final:
+            while current and current[-1]["type"] == "heading":
+                carry.insert(0, current.pop())
+        if current:
+            content = "\n\n".join(b["text"] for b in current)
+            chunks.append({
+                "text": content,
+                "tokens": estimate_tokens(content),
+                "page": current[0]["page"],
+                "page_end": current[-1]["page"],
+                "section": _chunk_section(current),
+                "index": len(chunks)
+            })
+        current = carry
+        current_tokens = sum(estimate_tokens(b["text"]) for b in carry)
+
+    for block in _parse_blocks(text):
+        block_tokens = estimate_tokens(block["text"])
+
+        # 新标题开启新块（当前块过小时继续合并，避免碎片）
+        if block["type"] == "heading" and current_tokens >= min_tokens:
+            flush()
+
+        if block_tokens > max_tokens:
+            flush()
+            # 待处理的标题并入第一个子块，切分时为其预留token
+            heading_tokens = current_tokens
+            pieces = _split_oversized(block, max(max_tokens - heading_tokens, max_tokens // 2), overlap_tokens)
+            if current:
+                pieces[0] = {**pieces[0], "text": "\n\n".join([b["text"] for b in current] + [pieces[0]["text"]]),
+                             "page": current[0]["page"]}
+                current = []
+            for piece in pieces:
+                current = [piece]
+                flush()
+            continue
+
+        if current and current_tokens + block_tokens > max_tokens:
+            flush()
+
+        current.append(block)
+        current_tokens += block_tokens
+
+    flush(final=True)
+    return chunks
+
+
+def format_chunk(chunk: Dict[str, Any], doc_name: str) -> str:
+    """为块加上来源标注（文档名、页码、章节），便于检索和引用"""
+    pages = f"第{chunk['page']}页" if chunk["page"] == chunk["page_end"] else f"第{chunk['page']}-{chunk['page_end']}页"
+    location = f"{doc_name} | {pages}"
+    if chunk["section"]:
+        location += f" | {chunk['section']}"
+    return f"[{location}]\n{chunk['text']}"
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+上下文组装 - 核心模块
+
+在答案合成之前对检索结果做去重、低分过滤、相关句抽取和token预算控制，
+减少发送给LLM的提示词token
+"""
+
+import os
+import re
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from src.utils.tokens import estimate_tokens
+
+# 各模型的上下文token预算，可通过 CONTEXT_TOKEN_BUDGET 统一覆盖
+TOKEN_BUDGETS: Dict[str, int] = {
+    "gpt-4.1-mini": 1500,
+    "gpt-4o-mini": 1500,
+    "gpt-4o": 2000,
+    "default": 1200,
+}
+
+# 相对分数阈值：低于最高分该比例的段落被丢弃
+RELATIVE_SCORE_THRESHOLD = 0.5
+
+_SENTENCE_RE = re.compile(r".+?(?:[。！？!?；;]+|\.(?=\s)|\n|$)", re.S)
+_WORD_RE = re.compile(r"[A-Za-z0-9_]+")
+_CJK_RE = re.compile(r"[一-鿿]")
+_NORMALIZE_RE = re.compile(r"\W+")
+
+# 英文停用词：不参与相关性匹配，避免 "is"、"the"、"what" 让几乎所有句子都被判为相关
+_STOPWORDS = frozenset("""
+a an the and or but if then else of to in on at by for with from into onto about as than so
+is am are was were be been being do does did done have has had having can could will would
+shall should may might must not no nor
+i me my we our you your he him his she her it its they them their this that these those
+what which who whom whose when where why how there here
+please tell explain describe give show
+""".split())
+
+
+def get_token_budget(model: Optional[str] = None) -> int:
+    """获取模型的上下文token预算
+
+    Args:
+        model: 模型ID（可选）
+
+    Returns:
+        int: token预算
+    """
+    env_value = os.getenv("CONTEXT_TOKEN_BUDGET")
+    if env_value and env_value.isdigit():
+        return int(env_value)
+    return TOKEN_BUDGETS.get(model or "", TOKEN_BUDGETS["default"])
+
+
+def _terms(text: str) -> Set[str]:
+    """提取用于相关性计算的词项：英文单词（去除停用词）和中文二元组"""
+    lowered = text.lower()
+    terms = {word for word in _WORD_RE.findall(lowered) if word not in _STOPWORDS}
+    cjk = _CJK_RE.findall(lowered)
+    terms.update(a + b for a, b in zip(cjk, cjk[1:]))
+    return terms
+
+
+def _passage_text(hit: Dict[str, Any]) -> str:
+    """兼容不同检索结果格式，取出段落文本
+
+    RAG管道的检索结果将文本放在 metadata.content 中。
+    """
+    metadata = hit.get("metadata")
+    for source in (hit, metadata if isinstance(metadata, dict) else {}):
+        for key in ("content", "text", "page_content"):
+            if isinstance(source.get(key), str):
+                return source[key]
+    return ""
+
+
+def assemble_context(
+    question: str,
+    hits: List[Dict[str, Any]],
+    token_budget: int,
+    relative_threshold: float = RELATIVE_SCORE_THRESHOLD
+) -> Dict[str, Any]:
+    """将检索结果压缩为预算内的上下文
+
+    Args:
+        question: 用户问题
+        hits: 检索结果（按相关性降序），每项包含文本和可选的score
+        token_budget: 上下文token上限
+        relative_threshold: 相对分数阈值
+
+    Returns:
+        Dict: 包含 context（上下文文本）、tokens（估算token数）、passages（使用的段落数）
+    """
+    passages = [(hit, _passage_text(hit)) for hit in hits if isinstance(hit, dict)]
+    passages = [(hit, text) for hit, text in passages if text.strip()]
+    if not passages:
+        return {"context": "", "tokens": 0, "passages": 0}
+
+    # 丢弃相对低分的段落
+    scores = [hit.get("score") for hit, _ in passages]
+    if all(isinstance(score, (int, float)) for score in scores) and max(scores) > 0:
+        top_score = max(scores)
+        passages = [p for p, score in zip(passages, scores) if score >= top_score * relative_threshold]
+
+    question_terms = _terms(question)
+    seen: Set[str] = set()
+    selected: List[Tuple[str, List[str]]] = []
+
+    for _, text in passages:
+        # 分块时加入的来源标注单独保留，不参与句子筛选
+        label = ""
+        first_line, _, body = text.partition("\n")
+        if first_line.startswith("[") and first_line.rstrip().endswith("]") and body:
+            label, text = first_line.strip(), body
+        sentences = []
+        relevant = []
+        had_relevant = False
+        for sentence in _SENTENCE_RE.findall(text):
+            sentence = sentence.strip()
+            key = _NORMALIZE_RE.sub("", sentence.lower())
+            is_relevant = bool(key) and bool(question_terms & _terms(sentence))
+            had_relevant = had_relevant or is_relevant
+            # 句级去重：相邻块的重叠部分只保留一次
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            sentences.append(sentence)
+            if is_relevant:
+                relevant.append(sentence)
+        # 只保留与问题有词项重叠的句子；段落本身没有相关句时保留段首句作为上下文，
+        # 相关句都已在前面的段落中出现时整段丢弃
+        if relevant:
+            selected.append((label, relevant))
+        elif sentences and not had_relevant:
+            selected.append((label, sentences[:1]))
+
+    # 按段落排名依次填充，直到达到预算
+    parts: List[str] = []
+    used_tokens = 0
+    for label, sentences in selected:
+        kept = []
+        for sentence in sentences:
+            sentence_tokens = estimate_tokens(sentence)
+            if used_tokens + sentence_tokens > token_budget:
+                break
+            kept.append(sentence)
+            used_tokens += sentence_tokens
+        if kept:
+            used_tokens += estimate_tokens(label)
+            part = "".join(kept) if _CJK_RE.search(kept[0]) else " ".join(kept)
+            parts.append(f"{label}\n{part}" if label else part)
+        if used_tokens >= token_budget:
+            break
+
+    context = "\n\n".join(f"[{i}] {part}" for i, part in enumerate(parts, start=1))
+    return {"context": context, "tokens": estimate_tokens(context), "passages": len(parts)}
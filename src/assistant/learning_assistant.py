@@ -7,56 +7,279 @@
 """
 
 import os
+import sys
 import time
-import json
+import hashlib
+import threading
+import uuid
+import weakref
 from datetime import datetime
 from typing import Dict, List, Optional, Any, Tuple
 from hello_agents.tools import MemoryTool, RAGTool
+from hello_agents.memory.rag import pipeline as rag_pipeline
 
 # 导入图片处理相关模块
-from src.api.llm import OpenAIVisionClient
+from src.api.llm import OpenAIVisionClient, OpenAIChatClient
+from src.utils.cache import (
+    memory_search_cache,
+    install_query_embedding_cache,
+    normalize_query,
+    query_embedding_scope
+)
+from src.utils.single_flight import ask_flight, ingest_flight
+from src.assistant.session_journal import (
+    SessionJournal,
+    append_jsonl_async,
+    memory_journal_path,
+    write_file_async
+)
+from src.assistant.chunking import chunk_document, format_chunk, get_profile
+from src.assistant.context import assemble_context, get_token_budget
+from src.assistant.namespace_snapshot import RAG_COLLECTION
+from src.utils.tokens import estimate_tokens
+from src.utils.shared_store import SharedStore
+from src.assistant.session_state import (
+    DOCUMENT_LIMIT,
+    TEMP_NAME_LIMIT,
+    BoundedDict,
+    SessionStats,
+    deep_sizeof,
+    document_set,
+    intern_name
+)
 from markitdown import MarkItDown
 from dotenv import load_dotenv
 load_dotenv()
 
+# 进程内共享的OCR、MarkItDown和答案合成客户端
+_shared_clients: Dict[str, Any] = {}
+_shared_clients_lock = threading.Lock()
+
+
+def _get_shared_clients() -> Dict[str, Any]:
+    """获取进程内共享的客户端（首次调用时创建）"""
+    with _shared_clients_lock:
+        if not _shared_clients:
+            ocr_client = OpenAIVisionClient()
+            _shared_clients["ocr_client"] = ocr_client
+            _shared_clients["markitdown"] = MarkItDown(llm_client=ocr_client, llm_model=ocr_client.model)
+            _shared_clients["chat_client"] = OpenAIChatClient()
+        return _shared_clients
+
+
+class _UserTools:
+    """同一用户的会话共用的记忆工具和RAG工具
+
+    MemoryTool 持有该用户的工作/情景/语义记忆存储，是空闲会话的主要内存开销，
+    因此按用户共享，最后一个引用它的会话释放后随之回收。
+    """
+
+    __slots__ = ("memory_tool", "rag_tool", "__weakref__")
+
+    def __init__(self, user_id: str):
+        self.memory_tool = MemoryTool(user_id=user_id)
+        self.rag_tool = RAGTool(rag_namespace=f"pdf_{user_id}", collection_name=RAG_COLLECTION)
+
+
+# 按用户ID登记的工具（弱引用，不阻止回收）
+_user_tools: "weakref.WeakValueDictionary[str, _UserTools]" = weakref.WeakValueDictionary()
+_user_tools_lock = threading.Lock()
+
+
+def _get_user_tools(user_id: str) -> _UserTools:
+    """获取用户的工具（不存在时创建，创建过程不持有锁）"""
+    with _user_tools_lock:
+        tools = _user_tools.get(user_id)
+    if tools is None:
+        created = _UserTools(user_id)
+        with _user_tools_lock:
+            tools = _user_tools.setdefault(user_id, created)
+    return tools
+
+
+def _process_shared_types() -> Tuple[type, ...]:
+    """进程级共享对象的类型，估算会话内存时不计入
+
+    HelloAgents的嵌入模型、向量存储和文档存储在进程内按配置复用，按公开的类型排除。
+    """
+    try:
+        from hello_agents.memory.embedding import EmbeddingModel
+        from hello_agents.memory.storage.document_store import DocumentStore
+        from hello_agents.memory.storage.qdrant_store import QdrantVectorStore
+    except Exception as e:
+        print(f"⚠️ 无法识别HelloAgents共享存储类型，内存估算可能偏大: {str(e)}")
+        return ()
+    return (EmbeddingModel, DocumentStore, QdrantVectorStore)
 
 
 class PDFLearningAssistant:
     """智能文档问答助手"""
 
-    def __init__(self, user_id: str = "default_user"):
+    __slots__ = (
+        "user_id", "store", "session_id",
+        "tools", "memory_tool", "rag_tool",
+        "ocr_client", "markitdown", "chat_client",
+        "stats", "journal", "_rag_stats_cache",
+        "current_documents", "temp_to_original"
+    )
+
+    def __init__(self, user_id: str = "default_user", store: Optional[SharedStore] = None,
+                 session_id: Optional[str] = None):
         """初始化学习助手
 
         Args:
             user_id: 用户ID，用于隔离不同用户的数据
+            store: 共享状态存储（可选，多进程部署时使用）
+            session_id: 要接续的会话ID（可选，需配合store使用）
         """
-        self.user_id = user_id
-        self.session_id = f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        self.user_id = intern_name(user_id)
+        self.store = store
+        # 时间戳后附加随机后缀，同一秒内初始化的会话不会共用事件日志和聚合结果
+        self.session_id = f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+
+        # 初始化工具（同一用户的会话共用）
+        self.tools = _get_user_tools(self.user_id)
+        self.memory_tool = self.tools.memory_tool
+        self.rag_tool = self.tools.rag_tool
+        # 为重复的记忆检索查询缓存嵌入向量
+        install_query_embedding_cache()
+
+        # 图片处理工具和答案合成客户端在进程内共享，不随会话重复创建
+        clients = _get_shared_clients()
+        self.ocr_client = clients["ocr_client"]
+        self.markitdown = clients["markitdown"]
+        self.chat_client = clients["chat_client"]
 
-        # 初始化工具
-        self.memory_tool = MemoryTool(user_id=user_id)
-        self.rag_tool = RAGTool(rag_namespace=f"pdf_{user_id}")
+        # 学习统计
+        self.stats = SessionStats()
 
-        # 初始化图片处理工具
-        self.ocr_client = OpenAIVisionClient()
-        self.markitdown = MarkItDown(llm_client=self.ocr_client, llm_model=self.ocr_client.model)
+        # 缓存的RAG统计，文档加载后失效
+        self._rag_stats_cache = None
 
-        # 学习统计
-        self.stats = {
-            "session_start": datetime.now(),
-            "documents_loaded": 0,
-            "images_loaded": 0,
-            "questions_asked": 0,
-            "concepts_learned": 0
+        # 当前加载的文档（有序、有上限的集合）
+        self.current_documents = document_set()
+        # 临时文件名到原始文件名的映射（只保留最近的条目）
+        self.temp_to_original = BoundedDict()
+
+        # 接续其他工作进程创建的会话
+        shared_state = store.get("session", user_id) if store is not None and session_id else None
+        if shared_state and shared_state["session_id"] == session_id:
+            self.session_id = session_id
+            self._adopt_state(shared_state)
+        else:
+            # 从向量库加载已存在的文档信息
+            self._load_existing_documents()
+            if store is not None:
+                store.set("session", user_id, self._state_snapshot())
+
+        # 会话事件日志（报告的增量聚合来源）
+        self.journal = SessionJournal(self.session_id, store=store)
+
+    def _state_snapshot(self) -> Dict[str, Any]:
+        """导出可JSON序列化的会话状态"""
+        return {
+            "session_id": self.session_id,
+            "session_start": self.stats["session_start"].isoformat(),
+            "stats": {k: v for k, v in self.stats.items() if k != "session_start"},
+            "current_documents": list(self.current_documents),
+            "temp_to_original": dict(self.temp_to_original)
         }
 
-        # 当前加载的文档
-        self.current_documents = []
-        # 临时文件名到原始文件名的映射
-        self.temp_to_original = {}
-        
-        # 从向量库加载已存在的文档信息
-        self._load_existing_documents()
+    def _adopt_state(self, state: Dict[str, Any]):
+        """用共享存储中的会话状态覆盖本地状态
+
+        列表和映射先构建新对象再整体替换，其他线程正在遍历的旧对象不会被修改。
+        """
+        self.stats.update(state["stats"])
+        self.stats["session_start"] = datetime.fromisoformat(state["session_start"])
+        temp_to_original = BoundedDict()
+        for temp_name, doc_name in state["temp_to_original"].items():
+            temp_to_original[temp_name] = intern_name(doc_name)
+        self.current_documents = document_set(state["current_documents"])
+        self.temp_to_original = temp_to_original
+
+    def _refresh_state(self):
+        """共享模式下从存储读取其他工作进程写入的最新会话状态"""
+        if self.store is None:
+            return
+        state = self.store.get("session", self.user_id)
+        if state and state["session_id"] == self.session_id:
+            self._adopt_state(state)
+
+    def _commit_state(self, increments: Optional[Dict[str, int]] = None,
+                      values: Optional[Dict[str, Any]] = None,
+                      document: Optional[Tuple[str, str]] = None):
+        """更新会话状态，共享模式下在存储中原子地合并
+
+        Args:
+            increments: 需要累加的统计项
+            values: 需要直接赋值的统计项
+            document: 新加载的文档 (临时文件名, 文档名)
+        """
+        superseded = False
+
+        def apply(state):
+            nonlocal superseded
+            # 存储中的会话已被其他工作进程重新初始化时，不把本会话的更新写到新会话上
+            if state["session_id"] != self.session_id:
+                superseded = True
+                return state
+            for key, amount in (increments or {}).items():
+                state["stats"][key] = state["stats"].get(key, 0) + amount
+            state["stats"].update(values or {})
+            if document:
+                temp_name, doc_name = document
+                doc_name = intern_name(doc_name)
+                mapping = state["temp_to_original"]
+                mapping[temp_name] = doc_name
+                # 共享存储中的映射同样只保留最近的条目
+                while len(mapping) > TEMP_NAME_LIMIT:
+                    del mapping[next(iter(mapping))]
+                documents = state["current_documents"]
+                if isinstance(documents, list):
+                    # 共享存储中以列表保存，同样只保留最近的文档名
+                    if doc_name not in documents:
+                        documents.append(doc_name)
+                    del documents[:-DOCUMENT_LIMIT]
+                else:
+                    documents[doc_name] = None
+            return state
+
+        local_state = {
+            "session_id": self.session_id,
+            "stats": self.stats,
+            "current_documents": self.current_documents,
+            "temp_to_original": self.temp_to_original
+        }
+        if self.store is None:
+            apply(local_state)
+            return
+
+        state = self.store.update("session", self.user_id, apply, default=self._state_snapshot())
+        if superseded:
+            # 只更新本地状态，不接管新会话的状态
+            print(f"⚠️ 会话 {self.session_id} 已被 {state['session_id']} 取代，本次更新仅保留在本地")
+            apply(local_state)
+        else:
+            self._adopt_state(state)
+
+    def _get_rag_stats(self) -> Any:
+        """获取RAG统计（带缓存，共享模式下缓存在存储中）"""
+        if self.store is not None:
+            rag_stats = self.store.get("rag_stats", self.user_id)
+            if rag_stats is None:
+                rag_stats = self.rag_tool.execute("stats")
+                self.store.set("rag_stats", self.user_id, rag_stats)
+            return rag_stats
+        if self._rag_stats_cache is None:
+            self._rag_stats_cache = self.rag_tool.execute("stats")
+        return self._rag_stats_cache
+
+    def _invalidate_rag_stats(self):
+        """文档变化后使RAG统计缓存失效"""
+        self._rag_stats_cache = None
+        if self.store is not None:
+            self.store.delete("rag_stats", self.user_id)
 
     def _load_existing_documents(self):
         """从向量库加载已存在的文档信息"""
@@ -83,17 +306,17 @@ class PDFLearningAssistant:
                             if "document" in metadata:
                                 doc_name = metadata["document"]
                                 if doc_name not in self.current_documents:
-                                    self.current_documents.append(doc_name)
+                                    self.current_documents[intern_name(doc_name)] = None
                                     has_documents = True
                             elif "filename" in metadata:
                                 doc_name = metadata["filename"]
                                 if doc_name not in self.current_documents:
-                                    self.current_documents.append(doc_name)
+                                    self.current_documents[intern_name(doc_name)] = None
                                     has_documents = True
                     
                     # 如果没有找到具体的文档名，至少标记有文档
                     if not has_documents and len(search_result) > 0:
-                        self.current_documents = ["已加载文档"]
+                        self.current_documents = document_set(["已加载文档"])
                         has_documents = True
                         print(f"✅ 通过搜索确认向量库中有文档")
             except Exception as search_error:
@@ -108,18 +331,18 @@ class PDFLearningAssistant:
                         if "documents" in rag_stats and rag_stats["documents"]:
                             existing_docs = rag_stats["documents"]
                             if isinstance(existing_docs, list):
-                                self.current_documents = existing_docs
+                                self.current_documents = document_set(existing_docs)
                                 self.stats["documents_loaded"] = len(existing_docs)
                                 has_documents = True
                         # 检查是否有chunks字段
                         elif "chunks" in rag_stats and rag_stats["chunks"] > 0:
                             self.stats["documents_loaded"] = 1
-                            self.current_documents = ["已加载文档"]
+                            self.current_documents = document_set(["已加载文档"])
                             has_documents = True
                         # 检查是否有点数信息
                         elif "points_count" in rag_stats and rag_stats["points_count"] > 0:
                             self.stats["documents_loaded"] = 1
-                            self.current_documents = ["已加载文档"]
+                            self.current_documents = document_set(["已加载文档"])
                             has_documents = True
                 except Exception as stats_error:
                     print(f"⚠️ 获取统计信息失败: {str(stats_error)}")
@@ -127,7 +350,7 @@ class PDFLearningAssistant:
             # 更新文档加载统计
             if has_documents:
                 self.stats["documents_loaded"] = len(self.current_documents)
-                print(f"✅ 已加载向量库中已存在的文档: {self.current_documents}")
+                print(f"✅ 已加载向量库中已存在的文档: {list(self.current_documents)}")
             else:
                 print(f"ℹ️ 向量库中没有已加载的文档")
         except Exception as e:
@@ -142,10 +365,13 @@ class PDFLearningAssistant:
             original_filename: 原始文件名（可选）
 
         Returns:
-            Dict: 包含success和message的结果
+            Dict: 包含success和message的结果；与并发导入的其他文件内容相同时，
+                merged_into 为合并到的文档名
         """
         if not os.path.exists(file_path):
             return {"success": False, "message": f"文件不存在: {file_path}"}
+
+        self._refresh_state()
             
         # 检查文件是否已存在于当前加载的文档中
         temp_doc_name = os.path.basename(file_path)
@@ -158,6 +384,41 @@ class PDFLearningAssistant:
         doc_name = original_filename if original_filename else temp_doc_name
         ext = os.path.splitext(doc_name)[1].lower() if doc_name else os.path.splitext(file_path)[1].lower()
 
+        # 相同内容的并发导入只执行一次，其余请求共享结果
+        result, shared = ingest_flight.do(
+            (f"pdf_{self.user_id}", self._file_hash(file_path), ext),
+            lambda: self._load_by_type(file_path, doc_name, temp_doc_name, ext)
+        )
+        result = dict(result)
+        merged_into = result.get("document")
+        if shared and result.get("success") and merged_into and merged_into != doc_name:
+            # 以其他文件名上传的相同内容只写入一次知识库，本文件的临时名映射到已导入的文档
+            self._commit_state(document=(temp_doc_name, merged_into))
+            result["message"] = f"文档《{doc_name}》与《{merged_into}》内容相同，已合并到该文档"
+            result["merged_into"] = merged_into
+        return result
+
+    @staticmethod
+    def _file_hash(file_path: str) -> str:
+        """计算文件内容的SHA-256"""
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _load_by_type(self, file_path: str, doc_name: str, temp_doc_name: str, ext: str) -> Dict[str, Any]:
+        """按文件类型将文档写入知识库
+
+        Args:
+            file_path: 文件路径
+            doc_name: 文档名称
+            temp_doc_name: 临时文件名
+            ext: 文件扩展名
+
+        Returns:
+            Dict: 包含success和message的结果
+        """
         # 处理图片文件
         if ext in [".jpg", ".jpeg", ".png", ".gif", ".webp"]:
             return self.process_image(file_path, doc_name)
@@ -166,24 +427,33 @@ class PDFLearningAssistant:
             start_time = time.time()
 
             try:
-                # 使用RAG工具处理PDF
-                result = self.rag_tool.execute(
-                    "add_document",
-                    file_path=file_path,
-                    chunk_size=1000,
-                    chunk_overlap=200
-                )
+                # 转换为Markdown后按版面结构分块写入知识库
+                text_content = self.markitdown.convert(file_path).text_content
+                chunks = chunk_document(text_content, "pdf") if text_content else []
+                if chunks:
+                    self._add_chunks(chunks, doc_name)
+                else:
+                    # 未提取到文本时退回RAG工具自带的解析和分块（chunk_size同样以token计）
+                    profile = get_profile("pdf")
+                    result = self.rag_tool.execute(
+                        "add_document",
+                        file_path=file_path,
+                        chunk_size=profile["max_tokens"],
+                        chunk_overlap=profile["overlap_tokens"]
+                    )
+                    # RAG工具以字符串返回错误而不是抛出异常
+                    if not str(result).startswith("✅"):
+                        raise RuntimeError(str(result).strip())
 
                 process_time = time.time() - start_time
 
                 # 存储临时文件名到原始文件名的映射
-                self.temp_to_original[temp_doc_name] = doc_name
-                self.current_documents.append(doc_name)
-                self.stats["documents_loaded"] += 1
+                self._commit_state(increments={"documents_loaded": 1}, document=(temp_doc_name, doc_name))
+                self._invalidate_rag_stats()
+                self.journal.record("document_loaded", document=doc_name)
 
                 # 记录到学习记忆
-                self.memory_tool.execute(
-                    "add",
+                self._remember(
                     content=f"加载了文档《{doc_name}》",
                     memory_type="episodic",
                     importance=0.9,
@@ -207,6 +477,56 @@ class PDFLearningAssistant:
                 "message": f"不支持的文件类型: {ext}，仅支持PDF和图片文件"
             }
 
+    def _add_chunks(self, chunks: List[Dict[str, Any]], doc_name: str) -> int:
+        """将分块结果一次性批量写入知识库
+
+        块已按token大小切好，直接交给RAG管道的 index_chunks 批量嵌入和写入，不再二次切分和重叠；
+        页码和章节写入块的元数据，文本开头也带有来源标注。
+
+        Args:
+            chunks: chunk_document 返回的块列表
+            doc_name: 文档名称
+
+        Returns:
+            int: 写入的块数
+
+        Raises:
+            RuntimeError: 没有可写入的块，或向量库写入失败
+        """
+        pipeline = self.rag_tool._get_pipeline()
+        namespace = pipeline["namespace"]
+        doc_id = hashlib.md5(f"{namespace}|{doc_name}".encode("utf-8")).hexdigest()
+
+        records = []
+        for chunk in chunks:
+            text = format_chunk(chunk, doc_name)
+            content_hash = hashlib.md5(text.encode("utf-8")).hexdigest()
+            records.append({
+                # 点ID由文档和块序号决定，重复导入同一文档时覆盖而不是新增
+                "id": hashlib.md5(f"{doc_id}|{chunk['index']}|{content_hash}".encode("utf-8")).hexdigest(),
+                "content": text,
+                "metadata": {
+                    "source_path": doc_name,
+                    "document": doc_name,
+                    "doc_id": doc_id,
+                    "chunk_index": chunk["index"],
+                    "page": chunk["page"],
+                    "page_end": chunk["page_end"],
+                    "heading_path": chunk["section"] or None,
+                    "content_hash": content_hash,
+                    "namespace": namespace,
+                    "source": "rag",
+                    "external": True,
+                    "format": "markdown"
+                }
+            })
+        if not records:
+            raise RuntimeError(f"文档《{doc_name}》没有可写入的内容")
+
+        # 一次调用完成批量嵌入和写入；写入失败时 index_chunks 抛出 RuntimeError
+        rag_pipeline.index_chunks(store=pipeline["store"], chunks=records, rag_namespace=namespace)
+        return len(records)
+
     def ask(self, question: str, use_advanced_search: bool = True) -> str:
         """向文档提问
 
@@ -218,6 +538,7 @@ class PDFLearningAssistant:
             str: 答案
         """
         # 检查向量库中是否有文档
+        self._refresh_state()
         if not self.current_documents:
             try:
                 # 尝试获取向量库中的统计信息
@@ -243,36 +564,30 @@ class PDFLearningAssistant:
                     return "⚠️ 请先加载文档！使用 load_document() 方法加载PDF文档。"
                 
                 # 更新当前文档列表
-                self.current_documents = ["已加载文档"]
+                self.current_documents = document_set(["已加载文档"])
             except Exception as e:
                 return "⚠️ 请先加载文档！使用 load_document() 方法加载PDF文档。"
 
         # 记录问题到工作记忆
-        self.memory_tool.execute(
-            "add",
+        self._remember(
             content=f"提问: {question}",
             memory_type="working",
             importance=0.6,
             session_id=self.session_id
         )
 
-        # 使用RAG检索答案
-        answer = self.rag_tool.execute(
-            "ask",
-            question=question,
-            limit=5,
-            enable_advanced_search=use_advanced_search,
-            enable_mqe=use_advanced_search,
-            enable_hyde=use_advanced_search
+        # 相同命名空间、问题和检索参数的并发提问只检索和合成一次
+        answer, _ = ask_flight.do(
+            (f"pdf_{self.user_id}", normalize_query(question), use_advanced_search),
+            lambda: self._retrieve_answer(question, use_advanced_search)
         )
         
-        # 将答案中的临时文件名替换为原始文件名
-        for temp_name, original_name in self.temp_to_original.items():
+        # 将答案中的临时文件名替换为原始文件名（遍历快照，导入线程可能同时写入映射）
+        for temp_name, original_name in list(self.temp_to_original.items()):
             answer = answer.replace(temp_name, original_name)
 
         # 记录到情景记忆
-        self.memory_tool.execute(
-            "add",
+        self._remember(
             content=f"关于'{question}'的学习",
             memory_type="episodic",
             importance=0.7,
@@ -280,9 +595,103 @@ class PDFLearningAssistant:
             session_id=self.session_id
         )
 
-        self.stats["questions_asked"] += 1
+        self._commit_state(increments={"questions_asked": 1})
+        self.journal.record("qa_interaction", question=question[:200])
         return answer
 
+    def _retrieve_answer(self, question: str, use_advanced_search: bool) -> str:
+        """检索并合成答案
+
+        直接从RAG管道取得结构化检索结果，压缩上下文后合成答案；
+        仅在管道不可用或检索出错时退回RAG工具自带的问答。
+
+        Args:
+            question: 用户问题
+            use_advanced_search: 是否使用高级检索（MQE + HyDE）
+
+        Returns:
+            str: 答案
+        """
+        hits = self._search_hits(question, use_advanced_search)
+        if hits is None:
+            return self.rag_tool.execute(
+                "ask",
+                question=question,
+                limit=5,
+                enable_advanced_search=use_advanced_search,
+                enable_mqe=use_advanced_search,
+                enable_hyde=use_advanced_search
+            )
+        return self._answer_with_compressed_context(question, hits)
+
+    def _search_hits(self, question: str, use_advanced_search: bool) -> Optional[List[Dict[str, Any]]]:
+        """通过RAG管道检索，返回带score和metadata.content的结果列表
+
+        RAGTool 的 search 操作只返回格式化后的字符串，这里直接调用其管道的检索函数。
+
+        Args:
+            question: 用户问题
+            use_advanced_search: 是否使用高级检索（MQE + HyDE）
+
+        Returns:
+            Optional[List[Dict]]: 检索结果；管道不可用或检索出错时返回None
+        """
+        try:
+            pipeline = self.rag_tool._get_pipeline()
+            if use_advanced_search:
+                hits = pipeline["search_advanced"](query=question, top_k=8, enable_mqe=True, enable_hyde=True)
+            else:
+                hits = pipeline["search"](query=question, top_k=8)
+        except Exception as e:
+            print(f"⚠️ 管道检索失败，退回RAG问答: {str(e)}")
+            return None
+        return hits if isinstance(hits, list) else None
+
+    def _answer_with_compressed_context(self, question: str, hits: List[Dict[str, Any]]) -> str:
+        """压缩检索结果并合成答案
+
+        Args:
+            question: 用户问题
+            hits: 检索结果（按相关性降序）
+
+        Returns:
+            str: 答案
+        """
+        assembled = assemble_context(question, hits, get_token_budget(self.chat_client.model))
+        if not assembled["context"]:
+            return f"🤔 抱歉，我在知识库中没有找到与「{question}」相关的信息。"
+
+        messages = [
+            {"role": "system", "content": "你是文档问答助手。请仅根据提供的资料回答问题，资料不足时如实说明，并用[编号]标注引用来源。"},
+            {"role": "user", "content": f"资料：\n{assembled['context']}\n\n问题：{question}"}
+        ]
+        try:
+            answer, prompt_tokens = self.chat_client.complete(messages)
+        except Exception as e:
+            return f"❌ 答案生成失败: {str(e)}"
+
+        # 记录本次发送的提示词token数（接口未返回usage时使用估算值）
+        if prompt_tokens is None:
+            prompt_tokens = sum(estimate_tokens(m["content"]) for m in messages)
+        self._commit_state(
+            increments={"answers_synthesized": 1, "context_tokens_total": prompt_tokens},
+            values={"context_tokens_last": prompt_tokens}
+        )
+        return answer
+
+    def _remember(self, **kwargs):
+        """写入学习记忆，并使该用户的记忆检索缓存失效
+
+        Args:
+            **kwargs: 传递给 MemoryTool add 操作的参数
+        """
+        self.memory_tool.execute("add", **kwargs)
+        memory_search_cache.invalidate(self.user_id)
+        # 追加到记忆写入日志，供命名空间快照导出（工作记忆不会被恢复，不写日志）
+        if kwargs.get("memory_type") == "working":
+            return
+        append_jsonl_async(memory_journal_path(self.user_id), {"ts": round(time.time(), 3), **kwargs})
+
     def add_note(self, content: str, concept: Optional[str] = None):
         """添加学习笔记
 
@@ -290,8 +699,7 @@ class PDFLearningAssistant:
             content: 笔记内容
             concept: 相关概念（可选）
         """
-        self.memory_tool.execute(
-            "add",
+        self._remember(
             content=content,
             memory_type="semantic",
             importance=0.8,
@@ -299,7 +707,8 @@ class PDFLearningAssistant:
             session_id=self.session_id
         )
 
-        self.stats["concepts_learned"] += 1
+        self._commit_state(increments={"concepts_learned": 1})
+        self.journal.record("note_added", concept=concept or "general")
 
     def recall(self, query: str, limit: int = 5) -> str:
         """回顾学习历程
@@ -311,19 +720,51 @@ class PDFLearningAssistant:
         Returns:
             str: 相关记忆
         """
-        result = self.memory_tool.execute(
-            "search",
-            query=query,
-            limit=limit
-        )
+        # 命中缓存时跳过嵌入和向量检索
+        cache_key = memory_search_cache.key(self.user_id, query, limit)
+        cached = memory_search_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        # 结果缓存失效（如期间有新的记忆写入）时，仍可复用查询的嵌入向量
+        with query_embedding_scope(query):
+            result = self.memory_tool.execute(
+                "search",
+                query=query,
+                limit=limit
+            )
+        memory_search_cache.set(cache_key, result)
         return result
 
+    def memory_footprint(self) -> Dict[str, int]:
+        """估算本会话占用的内存（字节）
+
+        需要遍历工具对象的引用图，开销较大，只在管理接口按需调用。
+        tools 为该用户的记忆工具和RAG工具（含记忆存储），由同一用户的会话共用；
+        进程级共享的客户端、嵌入模型、向量存储和文档存储不计入。某一部分估算失败时跳过该部分。
+
+        Returns:
+            Dict[str, int]: 各部分及合计的字节数
+        """
+        seen = {id(client) for client in _shared_clients.values()}
+        skip_types = _process_shared_types()
+        footprint = {"instance": sys.getsizeof(self)}
+        for name in ("session_id", "stats", "journal", "current_documents", "temp_to_original",
+                     "_rag_stats_cache", "tools"):
+            try:
+                footprint[name] = deep_sizeof(getattr(self, name), seen, skip_types)
+            except Exception as e:
+                print(f"⚠️ 估算会话内存 {name} 失败: {str(e)}")
+        footprint["total"] = sum(footprint.values())
+        return footprint
+
     def get_stats(self) -> Dict[str, Any]:
         """获取学习统计
 
         Returns:
             Dict: 统计信息
         """
+        self._refresh_state()
         duration = (datetime.now() - self.stats["session_start"]).total_seconds()
 
         return {
@@ -332,6 +773,9 @@ class PDFLearningAssistant:
             "加载图片": self.stats["images_loaded"],
             "提问次数": self.stats["questions_asked"],
             "学习笔记": self.stats["concepts_learned"],
+            "提示词Token(最近)": self.stats["context_tokens_last"],
+            "提示词Token(平均)": round(self.stats["context_tokens_total"] / self.stats["answers_synthesized"])
+                if self.stats["answers_synthesized"] else 0,
             "当前文档": ", ".join(self.current_documents) if self.current_documents else "未加载"
         }
 
@@ -361,23 +805,18 @@ class PDFLearningAssistant:
                     "message": "图片文字提取失败，未获取到有效内容"
                 }
             
-            # 将提取的文字添加到知识库
-            self.rag_tool.execute(
-                "add_text",
-                text=text_content,
-                document_id=doc_name
-            )
+            # 将提取的文字按结构分块后添加到知识库
+            self._add_chunks(chunk_document(text_content, "image"), doc_name)
             
             process_time = time.time() - start_time
             
             # 更新统计信息
-            self.temp_to_original[os.path.basename(file_path)] = doc_name
-            self.current_documents.append(doc_name)
-            self.stats["images_loaded"] += 1
+            self._commit_state(increments={"images_loaded": 1}, document=(os.path.basename(file_path), doc_name))
+            self._invalidate_rag_stats()
+            self.journal.record("image_loaded", document=doc_name)
             
             # 记录到学习记忆
-            self.memory_tool.execute(
-                "add",
+            self._remember(
                 content=f"加载了图片《{doc_name}》",
                 memory_type="episodic",
                 importance=0.9,
@@ -405,11 +844,9 @@ class PDFLearningAssistant:
         Returns:
             Dict: 学习报告
         """
-        # 获取记忆摘要
-        memory_summary = self.memory_tool.execute("summary", limit=10)
-
-        # 获取RAG统计
-        rag_stats = self.rag_tool.execute("stats")
+        # 报告基于增量聚合生成，RAG统计仅在文档变化后重新获取
+        self._refresh_state()
+        rag_stats = self._get_rag_stats()
 
         # 生成报告
         duration = (datetime.now() - self.stats["session_start"]).total_seconds()
@@ -425,18 +862,14 @@ class PDFLearningAssistant:
                 "questions_asked": self.stats["questions_asked"],
                 "concepts_learned": self.stats["concepts_learned"]
             },
-            "memory_summary": memory_summary,
+            "memory_summary": self.journal.summary(),
             "rag_status": rag_stats
         }
 
-        # 保存到文件
+        # 在后台线程中保存到文件，不阻塞请求（返回时文件可能尚未写完，写入失败会打印错误）
         if save_to_file:
             report_file = f"learning_report_{self.session_id}.json"
-            try:
-                with open(report_file, 'w', encoding='utf-8') as f:
-                    json.dump(report, f, ensure_ascii=False, indent=2, default=str)
-                report["report_file"] = report_file
-            except Exception as e:
-                report["save_error"] = str(e)
+            write_file_async(report_file, report)
+            report["report_file"] = report_file
 
         return report
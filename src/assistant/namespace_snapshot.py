@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+命名空间快照 - 核心模块
+
+将一个 pdf_{user_id} 知识库命名空间导出为单个带版本号的归档文件，或从归档批量导入。
+知识库的块直接写入已有向量，不调用LLM和嵌入模型；记忆默认不恢复，
+显式开启时通过 MemoryTool 重放写入日志，情景和语义记忆会重新嵌入，工作记忆是进程内的短期记忆，不做恢复
+
+归档（zip）内容：
+- manifest.json: 格式版本、命名空间、向量维度、块数量等
+- chunks.jsonl: 每行一个块（点ID和payload，包含文本和元数据）
+- vectors.f16: 按块顺序排列的 float16 小端向量矩阵（块数 × 维度）
+- memory_journal.jsonl: 该用户的记忆写入日志
+"""
+
+import json
+import os
+import struct
+import tempfile
+import time
+import uuid
+import zipfile
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from src.assistant.session_journal import memory_journal_path
+
+# 归档格式版本
+SNAPSHOT_FORMAT_VERSION = 1
+
+# 知识库所在的Qdrant集合，与 PDFLearningAssistant 创建 RAGTool 时使用的集合一致
+# （QDRANT_COLLECTION 是HelloAgents记忆使用的集合，与此无关）
+RAG_COLLECTION = "rag_knowledge_base"
+
+# 重放时恢复的记忆类型（工作记忆只存在于进程内，不恢复）
+RESTORED_MEMORY_TYPES = ("episodic", "semantic")
+
+# 向量库payload中标识RAG命名空间的字段
+NAMESPACE_FIELD = os.getenv("SNAPSHOT_NAMESPACE_FIELD", "rag_namespace")
+
+# 每批滚动读取/写入的点数
+BATCH_SIZE = 256
+
+
+def _get_client():
+    """根据环境变量创建Qdrant客户端"""
+    from qdrant_client import QdrantClient
+    return QdrantClient(
+        url=os.getenv("QDRANT_URL"),
+        api_key=os.getenv("QDRANT_API_KEY") or None,
+        timeout=int(os.getenv("QDRANT_TIMEOUT", 30))
+    )
+
+
+def _namespace_filter(namespace: str, field: str = NAMESPACE_FIELD):
+    from qdrant_client.models import FieldCondition, Filter, MatchValue
+    return Filter(must=[FieldCondition(key=field, match=MatchValue(value=namespace))])
+
+
+def _iter_points(client, collection: str, namespace: str) -> Iterator[Any]:
+    """分批滚动读取命名空间内的所有点"""
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection,
+            scroll_filter=_namespace_filter(namespace),
+            limit=BATCH_SIZE,
+            offset=offset,
+            with_payload=True,
+            with_vectors=True
+        )
+        yield from points
+        if offset is None:
+            break
+
+
+def export_namespace(user_id: str, archive_path: str, collection: Optional[str] = None) -> Dict[str, Any]:
+    """导出用户的知识库命名空间
+
+    Args:
+        user_id: 用户ID（命名空间为 pdf_{user_id}）
+        archive_path: 归档文件路径
+        collection: Qdrant集合名（可选，默认为 RAG_COLLECTION）
+
+    Returns:
+        Dict: 归档的manifest
+    """
+    namespace = f"pdf_{user_id}"
+    collection = collection or RAG_COLLECTION
+    client = _get_client()
+
+    count = 0
+    dimension = None
+    tmp_path = f"{archive_path}.tmp"
+    with tempfile.TemporaryDirectory() as work_dir:
+        # zip同一时刻只能写一个条目，先写临时文件再打包
+        chunks_path = os.path.join(work_dir, "chunks.jsonl")
+        vectors_path = os.path.join(work_dir, "vectors.f16")
+        with open(chunks_path, "w", encoding="utf-8") as chunks_file, open(vectors_path, "wb") as vectors_file:
+            for point in _iter_points(client, collection, namespace):
+                vector = point.vector
+                if not isinstance(vector, list):
+                    raise ValueError("暂不支持命名向量（named vectors）的集合")
+                if dimension is None:
+                    dimension = len(vector)
+                elif len(vector) != dimension:
+                    raise ValueError(f"向量维度不一致: {len(vector)} != {dimension}")
+                chunks_file.write(json.dumps(
+                    {"id": point.id, "payload": point.payload},
+                    ensure_ascii=False, separators=(",", ":")
+                ) + "\n")
+                vectors_file.write(struct.pack(f"<{dimension}e", *vector))
+                count += 1
+
+        manifest = {
+            "format_version": SNAPSHOT_FORMAT_VERSION,
+            "namespace": namespace,
+            "user_id": user_id,
+            "namespace_field": NAMESPACE_FIELD,
+            "vector_dtype": "float16",
+            "vector_size": dimension or 0,
+            "count": count,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S")
+        }
+
+        with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr("manifest.json", json.dumps(manifest, ensure_ascii=False, indent=2))
+            archive.write(chunks_path, "chunks.jsonl")
+            archive.write(vectors_path, "vectors.f16")
+            journal_path = memory_journal_path(user_id)
+            if os.path.exists(journal_path):
+                archive.write(journal_path, "memory_journal.jsonl")
+
+    os.replace(tmp_path, archive_path)
+    return manifest
+
+
+def _iter_archive_points(archive: zipfile.ZipFile, dimension: int) -> Iterator[Tuple[Dict[str, Any], List[float]]]:
+    """按顺序读取归档中的块和对应向量"""
+    row_size = dimension * 2
+    with archive.open("chunks.jsonl") as chunks_file, archive.open("vectors.f16") as vectors_file:
+        for line in chunks_file:
+            if not line.strip():
+                continue
+            row = vectors_file.read(row_size)
+            if len(row) != row_size:
+                raise ValueError("向量数据与块数量不匹配")
+            yield json.loads(line), list(struct.unpack(f"<{dimension}e", row))
+
+
+def _replay_memory(journal: bytes, user_id: str) -> Dict[str, int]:
+    """将记忆写入日志重放到目标用户的记忆库，并追加到其写入日志
+
+    Args:
+        journal: 归档中的 memory_journal.jsonl 内容
+        user_id: 目标用户ID
+
+    Returns:
+        Dict[str, int]: restored（恢复数）、skipped（跳过的工作记忆等）、failed（失败数）
+    """
+    from hello_agents.tools import MemoryTool
+
+    memory_tool = MemoryTool(user_id=user_id)
+    counts = {"restored": 0, "skipped": 0, "failed": 0}
+    restored_lines = []
+    for line in journal.decode("utf-8").splitlines():
+        if not line.strip():
+            continue
+        try:
+            entry = json.loads(line)
+        except json.JSONDecodeError:
+            counts["failed"] += 1
+            continue
+        if entry.get("memory_type") not in RESTORED_MEMORY_TYPES:
+            counts["skipped"] += 1
+            continue
+        kwargs = {key: value for key, value in entry.items() if key != "ts"}
+        # MemoryTool 以字符串返回错误而不是抛出异常
+        if str(memory_tool.execute("add", **kwargs)).startswith("✅"):
+            counts["restored"] += 1
+            restored_lines.append(line)
+        else:
+            counts["failed"] += 1
+
+    if restored_lines:
+        journal_path = memory_journal_path(user_id)
+        os.makedirs(os.path.dirname(journal_path) or ".", exist_ok=True)
+        with open(journal_path, "a", encoding="utf-8") as f:
+            f.write("\n".join(restored_lines) + "\n")
+    return counts
+
+
+def import_namespace(archive_path: str, user_id: Optional[str] = None,
+                     collection: Optional[str] = None, restore_memory: bool = False) -> Dict[str, Any]:
+    """将归档批量导入空的命名空间
+
+    Args:
+        archive_path: 归档文件路径
+        user_id: 目标用户ID（可选，默认使用归档中的用户）
+        collection: Qdrant集合名（可选，默认为 RAG_COLLECTION）
+        restore_memory: 是否重放记忆写入日志恢复记忆（会逐条重新嵌入，默认关闭；
+            目标用户已有写入日志时跳过，避免重复写入）
+
+    Returns:
+        Dict: 包含 success、message、导入数量和记忆恢复结果的结果
+    """
+    from qdrant_client.models import Distance, PointStruct, VectorParams
+
+    collection = collection or RAG_COLLECTION
+    client = _get_client()
+
+    with zipfile.ZipFile(archive_path, "r") as archive:
+        manifest = json.loads(archive.read("manifest.json"))
+        if manifest.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+            return {"success": False, "message": f"不支持的快照版本: {manifest.get('format_version')}"}
+
+        user_id = user_id or manifest["user_id"]
+        namespace = f"pdf_{user_id}"
+        # 导入到其他用户时重新生成点ID，避免覆盖同一集合中源命名空间的数据
+        remap_ids = namespace != manifest["namespace"]
+        namespace_field = manifest.get("namespace_field", NAMESPACE_FIELD)
+        dimension = manifest["vector_size"]
+        if not manifest.get("count"):
+            return {"success": True, "message": f"快照为空，命名空间 {namespace} 无需导入", "count": 0}
+
+        if not client.collection_exists(collection):
+            distance = os.getenv("QDRANT_DISTANCE", "cosine").upper()
+            client.create_collection(
+                collection_name=collection,
+                vectors_config=VectorParams(size=dimension, distance=Distance[distance])
+            )
+        elif client.count(collection, count_filter=_namespace_filter(namespace, namespace_field), exact=True).count > 0:
+            return {"success": False, "message": f"命名空间 {namespace} 不为空，请先清空后再导入"}
+
+        imported = 0
+        batch = []
+        for chunk, vector in _iter_archive_points(archive, dimension):
+            payload = dict(chunk["payload"] or {})
+            payload[namespace_field] = namespace
+            point_id = str(uuid.uuid5(uuid.NAMESPACE_URL, f"{namespace}/{chunk['id']}")) if remap_ids else chunk["id"]
+            batch.append(PointStruct(id=point_id, vector=vector, payload=payload))
+            if len(batch) >= BATCH_SIZE:
+                client.upsert(collection_name=collection, points=batch, wait=False)
+                imported += len(batch)
+                batch = []
+        if batch:
+            client.upsert(collection_name=collection, points=batch, wait=True)
+            imported += len(batch)
+
+        # 恢复记忆：目标用户已有记忆写入日志时不覆盖也不重放
+        message = f"已导入 {imported} 个块到命名空间 {namespace}"
+        memory = None
+        if not restore_memory:
+            message += "；未恢复记忆（可用 --replay-memory 重放写入日志）"
+        elif "memory_journal.jsonl" not in archive.namelist():
+            message += "；快照中没有记忆写入日志"
+        elif os.path.exists(memory_journal_path(user_id)):
+            message += f"；用户 {user_id} 已有记忆写入日志，未恢复记忆"
+        else:
+            memory = _replay_memory(archive.read("memory_journal.jsonl"), user_id)
+            message += (f"；恢复记忆 {memory['restored']} 条"
+                        f"（跳过工作记忆等 {memory['skipped']} 条，失败 {memory['failed']} 条）")
+
+    return {"success": True, "message": message, "count": imported, "memory": memory}
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+会话事件日志 - 核心模块
+
+以追加写的紧凑JSON Lines记录每个会话的学习事件，并在内存中维护报告所需的
+增量聚合结果，生成报告时无需再查询记忆库和向量库
+"""
+
+import concurrent.futures
+import json
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+# 事件日志目录
+SESSION_LOG_DIR = os.getenv("SESSION_LOG_DIR", "session_logs")
+
+# 记忆写入日志目录（每个用户一个文件，用于命名空间快照）
+MEMORY_JOURNAL_DIR = os.getenv("MEMORY_JOURNAL_DIR", "memory_journal")
+
+# 报告中保留的最近事件数量
+RECENT_EVENT_LIMIT = 10
+
+# 单线程写入器：保证同一进程内的文件写入按提交顺序执行，且不阻塞请求线程
+_writer = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="journal-writer")
+
+
+def _dumps(data: Any) -> str:
+    """紧凑JSON序列化"""
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def _append_line(path: str, line: str):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
+
+
+def _write_file(path: str, content: str):
+    # 先写临时文件再替换，避免读到写了一半的报告
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def _log_failure(path: str, future: concurrent.futures.Future):
+    error = future.exception()
+    if error is not None:
+        print(f"⚠️ 写入文件 {path} 失败: {error}")
+
+
+def write_file_async(path: str, data: Any) -> concurrent.futures.Future:
+    """在后台线程中将数据以紧凑JSON写入文件，写入失败时打印错误
+
+    Args:
+        path: 目标文件路径
+        data: 可JSON序列化的数据
+
+    Returns:
+        Future: 写入任务
+    """
+    future = _writer.submit(_write_file, path, _dumps(data))
+    future.add_done_callback(lambda f: _log_failure(path, f))
+    return future
+
+
+def append_jsonl_async(path: str, data: Any) -> concurrent.futures.Future:
+    """在后台线程中向JSON Lines文件追加一条记录
+
+    Args:
+        path: 目标文件路径
+        data: 可JSON序列化的数据
+
+    Returns:
+        Future: 写入任务
+    """
+    future = _writer.submit(_append_line, path, _dumps(data))
+    future.add_done_callback(lambda f: _log_failure(path, f))
+    return future
+
+
+def memory_journal_path(user_id: str) -> str:
+    """返回用户记忆写入日志的路径"""
+    return os.path.join(MEMORY_JOURNAL_DIR, f"{user_id}.jsonl")
+
+
+class SessionJournal:
+    """会话事件日志及增量聚合"""
+
+    __slots__ = ("session_id", "store", "path", "event_counts", "recent_events", "last_event_time")
+
+    def __init__(self, session_id: str, log_dir: Optional[str] = None, store=None):
+        """初始化事件日志
+
+        Args:
+            session_id: 会话ID
+            log_dir: 日志目录（可选，默认为 SESSION_LOG_DIR）
+            store: 共享状态存储（可选）。提供时聚合结果保存在存储中，多个工作进程共同更新
+        """
+        self.session_id = session_id
+        self.store = store
+        self.path = os.path.join(log_dir or SESSION_LOG_DIR, f"{session_id}.events.jsonl")
+        self.event_counts: Dict[str, int] = {}
+        self.recent_events: Deque[Dict[str, Any]] = deque(maxlen=RECENT_EVENT_LIMIT)
+        self.last_event_time: Optional[float] = None
+
+    def _apply(self, event: Dict[str, Any]):
+        """将单个事件合并到聚合结果"""
+        event_type = event["t"]
+        self.event_counts[event_type] = self.event_counts.get(event_type, 0) + 1
+        self.recent_events.append(event)
+        self.last_event_time = event["ts"]
+
+    def record(self, event_type: str, **fields) -> Dict[str, Any]:
+        """记录事件：更新聚合结果并异步追加到日志文件
+
+        Args:
+            event_type: 事件类型（如 document_loaded、qa_interaction、note_added）
+            **fields: 事件附加字段
+
+        Returns:
+            Dict: 记录的事件
+        """
+        event = {"t": event_type, "ts": round(time.time(), 3), **fields}
+        if self.store is not None:
+            self.store.update("journal", self.session_id, lambda agg: self._merge(agg, event), default={})
+        else:
+            self._apply(event)
+        append_jsonl_async(self.path, event)
+        return event
+
+    @staticmethod
+    def _merge(aggregate: Dict[str, Any], event: Dict[str, Any]) -> Dict[str, Any]:
+        """将事件合并到共享存储中的聚合结果"""
+        counts = aggregate.setdefault("event_counts", {})
+        counts[event["t"]] = counts.get(event["t"], 0) + 1
+        aggregate["recent_events"] = (aggregate.get("recent_events", []) + [event])[-RECENT_EVENT_LIMIT:]
+        aggregate["last_event_time"] = event["ts"]
+        return aggregate
+
+    def summary(self) -> Dict[str, Any]:
+        """返回报告使用的事件摘要"""
+        if self.store is not None:
+            aggregate = self.store.get("journal", self.session_id, {})
+            counts = aggregate.get("event_counts", {})
+            return {
+                "total_events": sum(counts.values()),
+                "event_counts": counts,
+                "recent_events": aggregate.get("recent_events", [])
+            }
+        return {
+            "total_events": sum(self.event_counts.values()),
+            "event_counts": dict(self.event_counts),
+            "recent_events": [dict(event) for event in self.recent_events]
+        }
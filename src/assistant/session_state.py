@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+会话状态 - 核心模块
+
+常驻会话使用的紧凑数据结构：__slots__ 统计对象、有上限的文件名映射和文档集合，以及单个会话的内存占用估算
+"""
+
+import sys
+import time
+import types
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, Tuple
+
+# 临时文件名映射保留的最大条目数
+TEMP_NAME_LIMIT = 256
+
+# 会话中常驻的当前文档名数量上限（加载总数由 documents_loaded 统计）
+DOCUMENT_LIMIT = 256
+
+
+class SessionStats:
+    """学习统计
+
+    使用 __slots__ 存放计数器，会话开始时间以时间戳保存；
+    同时提供字典式访问（stats["questions_asked"]），兼容原有的使用方式。
+    """
+
+    COUNTERS = (
+        "documents_loaded",
+        "images_loaded",
+        "questions_asked",
+        "concepts_learned",
+        "answers_synthesized",
+        "context_tokens_total",
+        "context_tokens_last",
+    )
+
+    __slots__ = ("_session_start",) + COUNTERS
+
+    def __init__(self):
+        self._session_start = time.time()
+        for name in self.COUNTERS:
+            setattr(self, name, 0)
+
+    @property
+    def session_start(self) -> datetime:
+        """会话开始时间"""
+        return datetime.fromtimestamp(self._session_start)
+
+    @session_start.setter
+    def session_start(self, value: Any):
+        self._session_start = value.timestamp() if isinstance(value, datetime) else float(value)
+
+    def __getitem__(self, key: str) -> Any:
+        if key != "session_start" and key not in self.COUNTERS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key: str, value: Any):
+        if key != "session_start" and key not in self.COUNTERS:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """读取统计项，不存在时返回默认值"""
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def update(self, values: Dict[str, Any]):
+        """批量更新统计项（忽略未知字段）"""
+        for key, value in values.items():
+            if key == "session_start" or key in self.COUNTERS:
+                setattr(self, key, value)
+
+    def items(self) -> Iterator[Tuple[str, int]]:
+        """遍历计数器（不含会话开始时间）"""
+        return ((name, getattr(self, name)) for name in self.COUNTERS)
+
+
+class BoundedDict(OrderedDict):
+    """超出上限时淘汰最早写入条目的字典"""
+
+    def __init__(self, maxlen: int = TEMP_NAME_LIMIT):
+        super().__init__()
+        self.maxlen = maxlen
+
+    def __setitem__(self, key: Any, value: Any):
+        if key in self:
+            self.move_to_end(key)
+        super().__setitem__(key, value)
+        while len(self) > self.maxlen:
+            self.popitem(last=False)
+
+
+def intern_name(name: str) -> str:
+    """驻留文档名，相同的文档ID在各会话间共享同一个字符串对象"""
+    return sys.intern(name) if isinstance(name, str) else name
+
+
+def document_set(names: Iterable[str] = (), maxlen: int = DOCUMENT_LIMIT) -> BoundedDict:
+    """构建有序、有上限的文档名集合（键为文档名，值为None）
+
+    成员判断为O(1)，超出上限时淘汰最早加载的文档名。
+
+    Args:
+        names: 初始文档名
+        maxlen: 最大条目数
+
+    Returns:
+        BoundedDict: 文档名集合
+    """
+    documents = BoundedDict(maxlen)
+    for name in names:
+        documents[intern_name(name)] = None
+    return documents
+
+
+# 估算内存时不展开的对象类型（模块、类和函数属于进程共享的代码对象）
+_SKIPPED_TYPES = (
+    types.ModuleType,
+    type,
+    types.FunctionType,
+    types.BuiltinFunctionType,
+    types.MethodType,
+)
+
+
+def _snapshot(container: Any) -> list:
+    """复制容器内容；其他线程同时修改导致迭代失败时重试，仍失败则不展开该容器"""
+    for _ in range(3):
+        try:
+            if isinstance(container, dict):
+                return [item for pair in list(container.items()) for item in pair]
+            return list(container)
+        except RuntimeError:
+            continue
+    return []
+
+
+def deep_sizeof(obj: Any, seen: set = None, skip_types: Tuple[type, ...] = ()) -> int:
+    """估算对象及其引用对象占用的字节数（每个对象只计一次）
+
+    迭代遍历引用图，可用于工具对象这类较深的结构；模块、类和函数不计入，
+    预先放入seen的对象id和skip_types类型的对象（如进程级共享对象）也不计入。
+
+    Args:
+        obj: 要估算的对象
+        seen: 已统计对象的id集合
+        skip_types: 不计入的对象类型
+
+    Returns:
+        int: 字节数
+    """
+    seen = set() if seen is None else seen
+    skipped = _SKIPPED_TYPES + tuple(skip_types)
+    size = 0
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, skipped):
+            continue
+        seen.add(id(obj))
+        try:
+            size += sys.getsizeof(obj)
+        except TypeError:
+            continue
+
+        # 先复制为列表，其他线程同时修改容器时不会中断遍历
+        if isinstance(obj, (dict, list, tuple, set, frozenset, deque)):
+            stack.extend(_snapshot(obj))
+        else:
+            try:
+                attributes = getattr(obj, "__dict__", None)
+            except Exception:
+                attributes = None
+            if isinstance(attributes, dict):
+                stack.append(attributes)
+        for cls in type(obj).__mro__:
+            for name in getattr(cls, "__slots__", ()):
+                if name in ("__dict__", "__weakref__"):
+                    continue
+                try:
+                    stack.append(getattr(obj, name))
+                except Exception:
+                    continue
+    return size
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+缓存工具 - 工具模块
+
+提供线程安全的LRU缓存和记忆检索结果缓存，减少重复检索带来的嵌入和向量搜索开销
+"""
+
+import contextlib
+import contextvars
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterator, Optional, Tuple
+
+# 查询归一化时移除的标点（中英文）
+_PUNCTUATION_RE = re.compile(r"[\s,.!?;:，。！？；：、“”\"'‘’（）()【】\[\]]+")
+
+
+def normalize_query(query: str) -> str:
+    """归一化查询文本，使近似相同的查询命中同一缓存项
+
+    Args:
+        query: 原始查询
+
+    Returns:
+        str: 去除标点和多余空白并转为小写后的查询
+    """
+    return _PUNCTUATION_RE.sub(" ", query).strip().lower()
+
+
+class LRUCache:
+    """线程安全的LRU缓存，支持可选的过期时间"""
+
+    def __init__(self, maxsize: int = 256, ttl: Optional[float] = None):
+        """初始化缓存
+
+        Args:
+            maxsize: 最大缓存条目数
+            ttl: 过期时间（秒），None表示不过期
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """读取缓存，命中时将条目移到队尾"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            stored_at, value = item
+            if self.ttl is not None and time.time() - stored_at > self.ttl:
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        """写入缓存，超出容量时淘汰最久未使用的条目"""
+        with self._lock:
+            self._data[key] = (time.time(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def info(self) -> Dict[str, Any]:
+        """返回缓存命中统计"""
+        return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+
+class MemorySearchCache:
+    """记忆检索结果缓存
+
+    以 (用户, 归一化查询, 数量) 为键缓存 MemoryTool 的 search 结果。
+    每个用户维护一个版本号，新的记忆写入会使该用户的所有缓存项失效。
+    """
+
+    def __init__(self, maxsize: int = 512, ttl: Optional[float] = 600):
+        """初始化缓存
+
+        Args:
+            maxsize: 最大缓存条目数
+            ttl: 过期时间（秒）
+        """
+        self._cache = LRUCache(maxsize=maxsize, ttl=ttl)
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._store = None
+
+    def attach_store(self, store):
+        """使用共享存储保存版本号，使多个工作进程间的失效相互可见
+
+        Args:
+            store: SharedStore实例
+        """
+        self._store = store
+
+    def _version(self, user_id: str) -> int:
+        if self._store is not None:
+            return self._store.get("memory_cache_version", user_id, 0)
+        return self._versions.get(user_id, 0)
+
+    def key(self, user_id: str, query: str, limit: int) -> Tuple[str, int, str, int]:
+        """生成缓存键
+
+        键中包含用户当前的版本号。调用方应在检索前生成键并在写入时复用，
+        这样检索期间发生的记忆写入不会让旧结果落到新版本下。
+        """
+        return (user_id, self._version(user_id), normalize_query(query), limit)
+
+    def get(self, key: Tuple[str, int, str, int]) -> Any:
+        """读取缓存的检索结果，未命中返回None"""
+        return self._cache.get(key)
+
+    def set(self, key: Tuple[str, int, str, int], result: Any):
+        """缓存检索结果"""
+        self._cache.set(key, result)
+
+    def invalidate(self, user_id: str):
+        """使指定用户的缓存失效（旧版本条目随LRU自然淘汰）"""
+        if self._store is not None:
+            self._store.incr("memory_cache_version", user_id)
+            return
+        with self._lock:
+            self._versions[user_id] = self._versions.get(user_id, 0) + 1
+
+    def info(self) -> Dict[str, Any]:
+        """返回缓存命中统计"""
+        return self._cache.info()
+
+
+# 进程内共享的记忆检索缓存
+memory_search_cache = MemorySearchCache()
+
+
+# 查询嵌入缓存（仅缓存记忆检索查询的嵌入，以归一化查询为键）
+query_embedding_cache = LRUCache(maxsize=1024)
+
+# 当前正在检索的归一化查询；只在 query_embedding_scope 内有值
+_scoped_query: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("scoped_query", default=None)
+
+
+def _copy_vector(vector: Any) -> Any:
+    """复制向量，避免调用方修改缓存中的对象"""
+    return vector.copy() if hasattr(vector, "copy") else list(vector)
+
+
+@contextlib.contextmanager
+def query_embedding_scope(query: str) -> Iterator[None]:
+    """在该范围内，对与query归一化后相同的单条文本嵌入使用缓存
+
+    只在记忆检索期间开启，记忆写入等其他嵌入调用不经过缓存。
+
+    Args:
+        query: 检索查询
+    """
+    token = _scoped_query.set(normalize_query(query))
+    try:
+        yield
+    finally:
+        _scoped_query.reset(token)
+
+
+def install_query_embedding_cache() -> bool:
+    """为HelloAgents共享的文本嵌入器加上查询嵌入缓存
+
+    包装后的 encode 仅在 query_embedding_scope 内、且待编码文本就是当前检索查询时走缓存，
+    近似相同的查询（大小写、标点、空白不同）共享同一向量；其余调用原样转发。
+    若当前版本的hello_agents未提供共享嵌入器，则不做任何修改。
+
+    Returns:
+        bool: 是否安装成功
+    """
+    try:
+        from hello_agents.memory.embedding import get_text_embedder
+        embedder = get_text_embedder()
+    except Exception:
+        return False
+
+    if getattr(embedder, "_query_cache_installed", False):
+        return True
+
+    original_encode = embedder.encode
+
+    def encode(texts, *args, **kwargs):
+        scoped = _scoped_query.get()
+        if scoped is None or not isinstance(texts, str) or args or kwargs:
+            return original_encode(texts, *args, **kwargs)
+        key = normalize_query(texts)
+        if key != scoped:
+            return original_encode(texts)
+        vector = query_embedding_cache.get(key)
+        if vector is None:
+            vector = original_encode(texts)
+            query_embedding_cache.set(key, _copy_vector(vector))
+            return vector
+        return _copy_vector(vector)
+
+    try:
+        embedder.encode = encode
+        embedder._query_cache_installed = True
+    except Exception:
+        return False
+    return True
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+执行器池 - 工具模块
+
+为异步API提供按任务类型隔离、可单独设置大小的线程池，并在排队已满时拒绝新任务（准入控制）
+"""
+
+import asyncio
+import concurrent.futures
+import contextvars
+import functools
+import os
+import threading
+from typing import Any, Callable, Dict
+
+
+class QueueFullError(Exception):
+    """执行器排队已满，任务被拒绝"""
+
+    def __init__(self, pool_name: str, retry_after: int):
+        super().__init__(f"执行器 {pool_name} 繁忙，请稍后重试")
+        self.pool_name = pool_name
+        self.retry_after = retry_after
+
+
+class BoundedExecutor:
+    """带准入控制的线程池
+
+    同时在执行和排队的任务数不超过 max_workers + max_queue，超出时抛出 QueueFullError。
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int, retry_after: int = 5):
+        """初始化执行器
+
+        Args:
+            name: 执行器名称
+            max_workers: 工作线程数
+            max_queue: 最大排队任务数
+            retry_after: 拒绝时建议客户端重试的等待秒数
+        """
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix=f"{name}-pool"
+        )
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def _acquire(self):
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                raise QueueFullError(self.name, self.retry_after)
+            self._pending += 1
+
+    def _release(self, _future=None):
+        with self._lock:
+            self._pending -= 1
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """在执行器中运行阻塞函数并等待结果
+
+        Args:
+            func: 阻塞函数
+            *args: 位置参数
+            **kwargs: 关键字参数
+
+        Returns:
+            Any: 函数返回值
+
+        Raises:
+            QueueFullError: 排队已满
+        """
+        self._acquire()
+        try:
+            # 复制当前上下文，使请求级的上下文变量（如剖析追踪）在工作线程中可见
+            context = contextvars.copy_context()
+            future = self._executor.submit(context.run, functools.partial(func, *args, **kwargs))
+        except Exception:
+            self._release()
+            raise
+        # 任务真正结束（而非协程被取消）时才释放名额
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> Dict[str, Any]:
+        """返回执行器负载信息"""
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "pending": self._pending
+        }
+
+    def shutdown(self, wait: bool = True):
+        """关闭执行器"""
+        self._executor.shutdown(wait=wait)
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+# 文档/图片导入：耗时长，线程少
+ingest_executor = BoundedExecutor(
+    "ingest",
+    max_workers=_env_int("INGEST_WORKERS", 2),
+    max_queue=_env_int("INGEST_QUEUE", 8),
+    retry_after=30
+)
+
+# 问答、回顾、笔记和报告：调用LLM、嵌入模型或向量库，中等耗时
+chat_executor = BoundedExecutor(
+    "chat",
+    max_workers=_env_int("CHAT_WORKERS", 8),
+    max_queue=_env_int("CHAT_QUEUE", 32),
+    retry_after=5
+)
+
+# 统计、会话同步等不调用上游服务的轻量操作：独立线程池，不会排在导入和问答之后
+light_executor = BoundedExecutor(
+    "light",
+    max_workers=_env_int("LIGHT_WORKERS", 4),
+    max_queue=_env_int("LIGHT_QUEUE", 64),
+    retry_after=1
+)
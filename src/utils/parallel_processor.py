@@ -7,6 +7,7 @@
 """
 
 import concurrent.futures
+import contextvars
 import time
 from typing import List, Dict, Any, Callable
 
@@ -31,9 +32,9 @@ def process_files_in_parallel(
 
     # 使用线程池并行处理文件
     with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # 提交所有任务
+        # 提交所有任务（每个任务运行在调用方上下文的副本中，使剖析追踪等上下文变量在工作线程中可见）
         future_to_file = {
-            executor.submit(process_func, file_path): file_path 
+            executor.submit(contextvars.copy_context().run, process_func, file_path): file_path
             for file_path in file_paths
         }
 
@@ -79,9 +80,9 @@ def process_files_in_parallel_with_progress(
 
     # 使用线程池并行处理文件
     with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # 提交所有任务
+        # 提交所有任务（每个任务运行在调用方上下文的副本中，使剖析追踪等上下文变量在工作线程中可见）
         future_to_file = {
-            executor.submit(process_func, file_path): file_path 
+            executor.submit(contextvars.copy_context().run, process_func, file_path): file_path
             for file_path in file_paths
         }
 
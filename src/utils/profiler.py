@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+性能剖析 - 工具模块
+
+提供可选开启的请求级耗时追踪：
+- 阶段耗时：PDFLearningAssistant 的 ask/load_document/process_image 及其内部的上游调用
+  （RAG检索/问答/批量写入、记忆读写、答案合成、OCR转换）
+- 采样剖析：按请求开启，周期性采样执行线程的调用栈
+- 飞行记录器：在内存中保留最慢的N个请求及其阶段明细
+
+通过 install_profiling() 对类方法打补丁，调用方无需修改代码。
+
+命令行查看（需服务开启 PROFILING_ENABLED）：
+    python -m src.utils.profiler --url http://localhost:7866
+"""
+
+import contextvars
+import functools
+import heapq
+import itertools
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional
+
+# 是否开启剖析（默认关闭）
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "").lower() in ("1", "true", "yes")
+
+# 飞行记录器保留的最慢请求数
+FLIGHT_RECORDER_SIZE = int(os.getenv("FLIGHT_RECORDER_SIZE", 20))
+
+# 采样间隔（秒）
+SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", 0.005))
+
+# 当前请求的追踪记录
+current_trace: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("current_trace", default=None)
+
+_trace_ids = itertools.count(1)
+
+
+class Trace:
+    """单个请求的耗时追踪"""
+
+    def __init__(self, name: str, sample: bool = False):
+        """初始化追踪
+
+        Args:
+            name: 请求名称（如 POST /api/chat）
+            sample: 是否开启采样剖析
+        """
+        self.trace_id = next(_trace_ids)
+        self.name = name
+        self.started_at = time.time()
+        self.duration: Optional[float] = None
+        self.stages: List[Dict[str, Any]] = []
+        self.sampler = StackSampler() if sample else None
+        self._lock = threading.Lock()
+
+    def add_stage(self, name: str, start: float, duration: float, depth: int, error: Optional[str] = None):
+        """记录一个阶段的耗时"""
+        stage = {
+            "name": name,
+            "start_ms": round((start - self.started_at) * 1000, 2),
+            "ms": round(duration * 1000, 2),
+            "depth": depth
+        }
+        if error:
+            stage["error"] = error
+        with self._lock:
+            self.stages.append(stage)
+
+    def finish(self):
+        """结束追踪"""
+        self.duration = time.time() - self.started_at
+        if self.sampler is not None:
+            self.sampler.stop()
+
+    def to_dict(self, top: int = 20) -> Dict[str, Any]:
+        """导出追踪结果"""
+        data = {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started_at)),
+            "duration_ms": round((self.duration or 0) * 1000, 2),
+            "stages": sorted(self.stages, key=lambda stage: (stage["start_ms"], stage["depth"]))
+        }
+        if self.sampler is not None:
+            data["profile"] = self.sampler.summary(top)
+        return data
+
+
+class StackSampler:
+    """采样剖析器：后台线程周期性采样登记线程的调用栈"""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self.total = 0
+        self._threads: set = set()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def watch_current_thread(self):
+        """登记当前线程，并在首次登记时启动采样线程"""
+        self._threads.add(threading.get_ident())
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id in list(self._threads):
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                stack = ";".join(
+                    f"{os.path.basename(f.filename)}:{f.name}:{f.lineno}"
+                    for f in traceback.extract_stack(frame)[-12:]
+                )
+                self.samples[stack] += 1
+                self.total += 1
+
+    def stop(self):
+        """停止采样"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+
+    def summary(self, top: int = 20) -> Dict[str, Any]:
+        """返回出现次数最多的调用栈"""
+        return {
+            "interval_ms": self.interval * 1000,
+            "samples": self.total,
+            "top_stacks": [
+                {"count": count, "ratio": round(count / self.total, 3), "stack": stack}
+                for stack, count in self.samples.most_common(top)
+            ] if self.total else []
+        }
+
+
+class FlightRecorder:
+    """飞行记录器：保留耗时最长的N个请求"""
+
+    def __init__(self, capacity: int = FLIGHT_RECORDER_SIZE):
+        self.capacity = capacity
+        self._heap: List[Any] = []
+        self._lock = threading.Lock()
+        self.recorded = 0
+
+    def record(self, trace: Trace):
+        """记录已结束的追踪，仅保留最慢的capacity个"""
+        item = (trace.duration or 0, trace.trace_id, trace)
+        with self._lock:
+            self.recorded += 1
+            if len(self._heap) < self.capacity:
+                heapq.heappush(self._heap, item)
+            elif item[0] > self._heap[0][0]:
+                heapq.heapreplace(self._heap, item)
+
+    def dump(self) -> Dict[str, Any]:
+        """按耗时降序导出记录"""
+        with self._lock:
+            traces = [item[2] for item in sorted(self._heap, key=lambda item: item[0], reverse=True)]
+        return {
+            "capacity": self.capacity,
+            "recorded": self.recorded,
+            "slowest": [trace.to_dict() for trace in traces]
+        }
+
+    def clear(self):
+        """清空记录"""
+        with self._lock:
+            self._heap.clear()
+
+
+flight_recorder = FlightRecorder()
+
+# 阶段嵌套深度
+_depth: contextvars.ContextVar[int] = contextvars.ContextVar("profile_depth", default=0)
+
+
+def _timed(name_func: Callable[..., str], func: Callable[..., Any], root: bool) -> Callable[..., Any]:
+    """包装函数：在当前追踪中记录其耗时
+
+    没有追踪时，root为True的函数（助手方法）为该调用单独创建追踪，其他函数（上游调用）不做记录。
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        trace = current_trace.get()
+        if trace is None and not root:
+            return func(*args, **kwargs)
+        name = name_func(*args, **kwargs)
+        owns_trace = trace is None
+        if owns_trace:
+            trace = Trace(name)
+            token = current_trace.set(trace)
+        if trace.sampler is not None:
+            trace.sampler.watch_current_thread()
+
+        depth = _depth.get()
+        depth_token = _depth.set(depth + 1)
+        start = time.time()
+        error = None
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            trace.add_stage(name, start, time.time() - start, depth, error)
+            _depth.reset(depth_token)
+            if owns_trace:
+                current_trace.reset(token)
+                trace.finish()
+                flight_recorder.record(trace)
+
+    wrapper._profiled = True
+    return wrapper
+
+
+def _patch(cls: Any, method: str, name_func: Callable[..., str], root: bool = False):
+    original = getattr(cls, method, None)
+    if original is None or getattr(original, "_profiled", False):
+        return
+    setattr(cls, method, _timed(name_func, original, root))
+
+
+def install_profiling():
+    """为助手方法和上游调用打上计时补丁（重复调用无副作用）"""
+    from hello_agents.memory.rag import pipeline as rag_pipeline
+    from hello_agents.tools import MemoryTool, RAGTool
+    from markitdown import MarkItDown
+    from src.api.llm import OpenAIChatClient
+    from src.assistant.learning_assistant import PDFLearningAssistant
+
+    for method in ("ask", "load_document", "process_image", "recall", "add_note", "generate_report"):
+        _patch(PDFLearningAssistant, method, lambda *a, _m=method, **k: f"assistant.{_m}", root=True)
+    _patch(RAGTool, "execute", lambda self, action=None, *a, **k: f"rag.{action}")
+    _patch(rag_pipeline, "index_chunks", lambda *a, **k: "rag.index_chunks")
+    _patch(rag_pipeline, "search_vectors", lambda *a, **k: "rag.search")
+    _patch(rag_pipeline, "search_vectors_expanded", lambda *a, **k: "rag.search_advanced")
+    _patch(MemoryTool, "execute", lambda self, action=None, *a, **k: f"memory.{action}")
+    _patch(OpenAIChatClient, "complete", lambda *a, **k: "llm.synthesis")
+    _patch(MarkItDown, "convert", lambda *a, **k: "markitdown.convert")
+
+
+def _main():
+    """命令行：从运行中的服务导出飞行记录"""
+    import argparse
+    import json
+    import urllib.request
+
+    parser = argparse.ArgumentParser(description="导出慢请求飞行记录")
+    parser.add_argument("--url", default="http://localhost:7866", help="服务地址")
+    parser.add_argument("--token", default=os.getenv("ADMIN_TOKEN"), help="管理接口令牌（可选）")
+    args = parser.parse_args()
+
+    request = urllib.request.Request(f"{args.url.rstrip('/')}/api/admin/profiles")
+    if args.token:
+        request.add_header("X-Admin-Token", args.token)
+    with urllib.request.urlopen(request) as response:
+        data = json.loads(response.read().decode("utf-8"))
+
+    for trace in data.get("slowest", []):
+        print(f"\n#{trace['trace_id']} {trace['name']}  {trace['duration_ms']:.0f}ms  ({trace['started_at']})")
+        for stage in trace["stages"]:
+            error = f"  [{stage['error']}]" if stage.get("error") else ""
+            print(f"  {'  ' * stage['depth']}{stage['name']:<28} {stage['ms']:>10.1f}ms{error}")
+        profile = trace.get("profile")
+        if profile and profile["top_stacks"]:
+            print(f"  采样: {profile['samples']} 次")
+            for item in profile["top_stacks"][:5]:
+                print(f"    {item['ratio']:>6.1%}  {item['stack'].split(';')[-1]}")
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+共享状态存储 - 工具模块
+
+基于SQLite（WAL模式）的本地键值存储，供同一节点上的多个工作进程共享会话状态、
+文档清单和缓存版本号
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Optional
+
+
+class SharedStore:
+    """多进程共享的JSON键值存储
+
+    数据按 (namespace, key) 存放，值为JSON。每个线程使用独立连接，
+    update 在写事务中完成读-改-写，保证多进程并发更新不丢失。
+    """
+
+    def __init__(self, path: str, timeout: float = 30.0):
+        """初始化存储
+
+        Args:
+            path: SQLite数据库文件路径
+            timeout: 等待写锁的超时时间（秒）
+        """
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS kv ("
+            "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+            "updated_at REAL NOT NULL, PRIMARY KEY (namespace, key))"
+        )
+
+    @classmethod
+    def from_env(cls) -> Optional["SharedStore"]:
+        """根据 SHARED_STATE_PATH 环境变量创建存储，未设置时返回None（单进程模式）"""
+        path = os.getenv("SHARED_STATE_PATH")
+        return cls(path) if path else None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        """读取值"""
+        row = self._connect().execute(
+            "SELECT value FROM kv WHERE namespace = ? AND key = ?", (namespace, key)
+        ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set(self, namespace: str, key: str, value: Any):
+        """写入值"""
+        self._connect().execute(
+            "INSERT OR REPLACE INTO kv (namespace, key, value, updated_at) VALUES (?, ?, ?, ?)",
+            (namespace, key, json.dumps(value, ensure_ascii=False, default=str), time.time())
+        )
+
+    def delete(self, namespace: str, key: str):
+        """删除值"""
+        self._connect().execute("DELETE FROM kv WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def update(self, namespace: str, key: str, func: Callable[[Any], Any], default: Any = None) -> Any:
+        """原子地读-改-写
+
+        Args:
+            namespace: 命名空间
+            key: 键
+            func: 接收旧值（不存在时为default）并返回新值的函数
+            default: 默认值
+
+        Returns:
+            Any: 新值
+        """
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT value FROM kv WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+            value = func(json.loads(row[0]) if row else default)
+            conn.execute(
+                "INSERT OR REPLACE INTO kv (namespace, key, value, updated_at) VALUES (?, ?, ?, ?)",
+                (namespace, key, json.dumps(value, ensure_ascii=False, default=str), time.time())
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return value
+
+    def incr(self, namespace: str, key: str, amount: int = 1) -> int:
+        """原子地增加整数值"""
+        return self.update(namespace, key, lambda value: (value or 0) + amount, default=0)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+请求合并 - 工具模块
+
+对同一键的并发调用只执行一次，其余调用等待并共享该次执行的结果（single-flight）
+"""
+
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class _Call:
+    """一次进行中的调用"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """线程安全的single-flight执行器"""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> Tuple[Any, bool]:
+        """执行func；若同一键已有进行中的调用，则等待并复用其结果
+
+        Args:
+            key: 合并键
+            func: 无参数的执行函数
+
+        Returns:
+            Tuple[Any, bool]: (结果, 是否复用了其他调用的结果)
+
+        Raises:
+            Exception: 执行函数抛出的异常会传递给所有等待者
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            # 先移除再通知，之后到达的调用会重新执行而不会拿到旧结果
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self) -> int:
+        """返回进行中的调用数"""
+        return len(self._calls)
+
+
+# 进程内共享：相同命名空间的助手实例之间也能合并
+ask_flight = SingleFlight()
+ingest_flight = SingleFlight()
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Token估算 - 工具模块
+
+不依赖具体模型的分词器，按中日韩字符逐字、其他文本按单词近似估算token数，
+用于分块大小和上下文预算控制
+"""
+
+import math
+import re
+
+# 中日韩字符（每个字符约1个token）
+_CJK_RE = re.compile(r"[぀-ヿ㐀-䶿一-鿿가-힯豈-﫿]")
+# 非中日韩的单词或符号
+_WORD_RE = re.compile(r"[A-Za-z0-9_]+|[^\sA-Za-z0-9_぀-ヿ㐀-䶿一-鿿가-힯豈-﫿]")
+
+# 英文单词平均约1.3个token
+_WORD_TOKEN_RATIO = 1.3
+
+
+def estimate_tokens(text: str) -> int:
+    """估算文本的token数
+
+    Args:
+        text: 文本
+
+    Returns:
+        int: 估算的token数
+    """
+    if not text:
+        return 0
+    cjk_count = len(_CJK_RE.findall(text))
+    word_count = len(_WORD_RE.findall(text))
+    return cjk_count + math.ceil(word_count * _WORD_TOKEN_RATIO)